@@ -0,0 +1,142 @@
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+import time
+
+# skeleton.py runs its driver on input.txt when imported, so import it from
+# the repository directory with that output swallowed
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+with contextlib.redirect_stdout(io.StringIO()):
+    import skeleton
+
+CONNECTIVES = ['/\\', '\\/', '=>']
+
+# Calibration runs every engine under this node budget; an engine answering 2
+# where another was definite is charged this factor on top of its time
+CALIBRATION_NODES = 20000
+INDEFINITE_PENALTY = 100.0
+
+def input_formulas(path='input.txt'):
+    with open(path) as f:
+        f.readline()
+        lines = [line.rstrip('\n') for line in f]
+    return [line for line in lines if skeleton.parse(line)]
+
+def propositional(depth, rng):
+    if depth == 0 or rng.random() < 0.15:
+        return rng.choice(skeleton.PROPOSITIONS)
+    if rng.random() < 0.2:
+        return '~' + propositional(depth - 1, rng)
+    return '(' + propositional(depth - 1, rng) + rng.choice(CONNECTIVES) + propositional(depth - 1, rng) + ')'
+
+def first_order(depth, rng, bound=()):
+    # Closed formulas: every atom only mentions variables bound above it
+    if not bound or (depth > 0 and rng.random() < 0.25):
+        var = rng.choice(skeleton.VARIABLES[:2])
+        return rng.choice(skeleton.QUANTIFIERS) + var + first_order(max(depth - 1, 0), rng, bound + (var,))
+    if depth == 0 or rng.random() < 0.2:
+        return '%s(%s,%s)' % (rng.choice('PQ'), rng.choice(bound), rng.choice(bound))
+    if rng.random() < 0.2:
+        return '~' + first_order(depth - 1, rng, bound)
+    return '(' + first_order(depth - 1, rng, bound) + rng.choice(CONNECTIVES) + \
+        first_order(depth - 1, rng, bound) + ')'
+
+def generated_formulas(count, seed=0):
+    rng = random.Random(seed)
+    formulas = [propositional(7, rng) for _ in range(count)]
+    formulas += [first_order(4, rng) for _ in range(count)]
+    return [formula for formula in formulas if skeleton.parse(formula)]
+
+def run(formulas, schedule):
+    # Scheduling only matters to the tableau, so keep every line on it
+    skeleton.PROPOSITIONAL_ENGINE = 'tableau'
+    skeleton.FIRST_ORDER_ENGINE = 'tableau'
+    skeleton.SCHEDULE = schedule
+    nodes = 0
+    answers = []
+    start = time.perf_counter()
+    for formula in formulas:
+        answers.append(skeleton.sat([skeleton.theory(formula)]))
+        nodes += skeleton.STATISTICS['nodes']
+    return nodes, time.perf_counter() - start, answers
+
+def compare_schedules(name, formulas):
+    print('%s: %d formulas' % (name, len(formulas)))
+    baseline = None
+    for schedule in skeleton.SCHEDULES:
+        nodes, seconds, answers = run(formulas, schedule)
+        if baseline is None:
+            baseline = nodes, answers
+        note = '' if answers == baseline[1] else '  (answers differ!)'
+        print('  %-14s %8d nodes  %6.1f%% of %s  %7.3fs%s'
+              % (schedule, nodes, 100.0 * nodes / max(baseline[0], 1), 'lexicographic', seconds, note))
+
+def solve(a, b):
+    # Solution x of a x = b by Gaussian elimination with partial pivoting
+    n = len(b)
+    rows = [list(a[i]) + [b[i]] for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda i: abs(rows[i][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for i in range(col + 1, n):
+            factor = rows[i][col] / rows[col][col]
+            for j in range(col, n + 1):
+                rows[i][j] -= factor * rows[col][j]
+    x = [0.0] * n
+    for i in reversed(range(n)):
+        x[i] = (rows[i][n] - sum(rows[i][j] * x[j] for j in range(i + 1, n))) / rows[i][i]
+    return x
+
+def fit(samples, ridge=1e-3):
+    # Least squares weights w with w . features ~ cost; the small ridge term
+    # keeps features that never vary (quantifiers of propositional lines)
+    # from making the system singular
+    n = len(samples[0][0])
+    a = [[sum(x[i] * x[j] for x, _ in samples) + (ridge if i == j else 0) for j in range(n)] for i in range(n)]
+    b = [sum(x[i] * cost for x, cost in samples) for i in range(n)]
+    return tuple(round(w, 4) for w in solve(a, b))
+
+def calibrate(formulas):
+    # COST_MODEL fitted to the log seconds every engine takes on formulas
+    skeleton.ROUTER = False
+    skeleton.PORTFOLIO = None
+    samples = {}
+    for formula in formulas:
+        tableau = [skeleton.theory(formula)]
+        line_class = skeleton.formula_class(tableau)
+        line = skeleton.line_features(tableau)
+        runs = {}
+        for engine in skeleton.ENGINES[line_class]:
+            if engine == 'models' and skeleton.np is None:
+                continue
+            if line_class == 'propositional':
+                skeleton.PROPOSITIONAL_ENGINE = engine
+            else:
+                skeleton.FIRST_ORDER_ENGINE = engine
+            start = time.perf_counter()
+            answer = skeleton.sat(tableau, skeleton.Budget(nodes=CALIBRATION_NODES))
+            runs[engine] = time.perf_counter() - start, answer
+        definite = any(answer != 2 for _, answer in runs.values())
+        for engine, (seconds, answer) in runs.items():
+            if definite and answer == 2:
+                seconds *= INDEFINITE_PENALTY
+            samples.setdefault(line_class, {}).setdefault(engine, []).append((line, math.log(seconds)))
+    return {line_class: {engine: fit(rows) for engine, rows in engines.items()}
+            for line_class, engines in samples.items()}
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--calibrate']
+    count = int(args[0]) if args else 200
+    if '--calibrate' in sys.argv:
+        # Print COST_MODEL for skeleton.py
+        for line_class, engines in calibrate(input_formulas() + generated_formulas(count)).items():
+            print('%r: {' % line_class)
+            for engine, weights in engines.items():
+                print('    %r: %r,' % (engine, weights))
+            print('},')
+        sys.exit(0)
+    compare_schedules('input.txt', input_formulas())
+    compare_schedules('generated', generated_formulas(count))
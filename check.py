@@ -0,0 +1,146 @@
+import contextlib
+import io
+import itertools
+import os
+import random
+import sys
+
+# skeleton.py runs its driver on input.txt when imported, so import it from
+# the repository directory with that output swallowed
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+with contextlib.redirect_stdout(io.StringIO()):
+    import skeleton
+    from bench import first_order, input_formulas, propositional
+
+# Every engine runs under this node budget, so a hard line costs a 2 rather
+# than the whole run. First order lines are also brute forced over every
+# interpretation with at most MODEL_SIZE elements.
+CHECK_NODES = 20000
+MODEL_SIZE = 2
+
+def configurations(line_class):
+    # (name, settings) for every way skeleton.py can decide a line of the class
+    for engine in skeleton.ENGINES[line_class]:
+        if engine == 'models' and skeleton.np is None:
+            continue
+        setting = 'PROPOSITIONAL_ENGINE' if line_class == 'propositional' else 'FIRST_ORDER_ENGINE'
+        if engine != 'tableau':
+            yield engine, {setting: engine}
+            continue
+        for search in ['stack', 'trail']:
+            for representation in skeleton.BRANCH_TYPES:
+                yield 'tableau/%s/%s' % (search, representation), \
+                    {setting: engine, 'SEARCH': search, 'BRANCH_REPRESENTATION': representation}
+
+def symbols(fid, found):
+    # The propositions and predicates occurring in an interned formula
+    node = skeleton.NODES[fid]
+    if node[0] in ['prop', 'atom']:
+        found.add(node[1])
+    elif node[0] == '~':
+        symbols(node[1], found)
+    elif node[0] in skeleton.CONNECTIVES:
+        symbols(node[1], found)
+        symbols(node[2], found)
+    elif node[0] in skeleton.QUANTIFIERS:
+        symbols(node[2], found)
+    return found
+
+def evaluate(fid, domain, true, env):
+    # Truth of an interned formula; true holds the true propositions and the
+    # (predicate, element, element) triples of the true atoms
+    node = skeleton.NODES[fid]
+    if node[0] == 'prop':
+        return node[1] in true
+    if node[0] == 'atom':
+        return (node[1], env[node[2]], env[node[3]]) in true
+    if node[0] == '~':
+        return not evaluate(node[1], domain, true, env)
+    if node[0] == '/\\':
+        return evaluate(node[1], domain, true, env) and evaluate(node[2], domain, true, env)
+    if node[0] == '\\/':
+        return evaluate(node[1], domain, true, env) or evaluate(node[2], domain, true, env)
+    if node[0] == '=>':
+        return not evaluate(node[1], domain, true, env) or evaluate(node[2], domain, true, env)
+    values = (evaluate(node[2], domain, true, dict(env, **{node[1]: d})) for d in domain)
+    return all(values) if node[0] == 'A' else any(values)
+
+def brute_force(formula):
+    # 1 if the formula has a model with at most MODEL_SIZE elements, else 0.
+    # Exact for propositional formulas; for first order ones a 0 only rules
+    # out the small models. None for formulas with free variables, which the
+    # engines read as opaque terms rather than as elements.
+    fid = skeleton.formula_id(formula)
+    if skeleton.free_variables(fid):
+        return None
+    found = symbols(fid, set())
+    for size in range(1, MODEL_SIZE + 1):
+        domain = range(size)
+        cells = [p for p in found if p in skeleton.PROPOSITIONS]
+        cells += [(P, a, b) for P in found if P in skeleton.PREDICATES for a in domain for b in domain]
+        for values in itertools.product([False, True], repeat=len(cells)):
+            true = {cell for cell, value in zip(cells, values) if value}
+            if evaluate(fid, domain, true, {}):
+                return 1
+    return 0
+
+def answers(formula):
+    # Answer of every configuration to the line
+    tableau = [skeleton.theory(formula)]
+    saved = {name: getattr(skeleton, name) for name in
+             ['PROPOSITIONAL_ENGINE', 'FIRST_ORDER_ENGINE', 'SEARCH', 'BRANCH_REPRESENTATION']}
+    result = {}
+    try:
+        for name, settings in configurations(skeleton.formula_class(tableau)):
+            for setting, value in settings.items():
+                setattr(skeleton, setting, value)
+            result[name] = skeleton.sat(tableau, skeleton.Budget(nodes=CHECK_NODES))
+    finally:
+        for setting, value in saved.items():
+            setattr(skeleton, setting, value)
+    return result
+
+def check(formula):
+    # Complaints about the line: engines with opposite definite answers, or a
+    # definite answer the brute force contradicts
+    result = answers(formula)
+    reference = brute_force(formula)
+    propositional_line = skeleton.parse(formula) in [6, 7, 8]
+    complaints = []
+    if len({answer for answer in result.values() if answer != 2}) > 1:
+        complaints.append('engines disagree')
+    for name, answer in result.items():
+        if answer == 0 and reference == 1:
+            complaints.append('%s answers 0 but a model exists' % name)
+        if answer == 1 and reference == 0 and propositional_line:
+            complaints.append('%s answers 1 but no valuation satisfies it' % name)
+    return result, reference, complaints
+
+def generated(count, seed):
+    # Smaller than bench.py's lines, so the brute force stays quick. Single
+    # first order lines are nearly always satisfiable, so half of them are
+    # conjunctions of two.
+    rng = random.Random(seed)
+    formulas = [propositional(rng.randint(1, 5), rng) for _ in range(count)]
+    formulas += [first_order(rng.randint(1, 3), rng) for _ in range(count // 2)]
+    formulas += ['(%s/\\%s)' % (first_order(rng.randint(1, 3), rng), first_order(rng.randint(1, 3), rng))
+                 for _ in range(count - count // 2)]
+    return [formula for formula in formulas if skeleton.parse(formula)]
+
+if __name__ == '__main__':
+    # python check.py [count] [seed]: exit status 1 if any line fails
+    skeleton.ROUTER = False
+    skeleton.PORTFOLIO = None
+    skeleton.RESULT_CACHE = None
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    failures = 0
+    formulas = input_formulas() + generated(count, seed)
+    for formula in formulas:
+        result, reference, complaints = check(formula)
+        if complaints:
+            failures += 1
+            print('%s: %s (brute force %s, %s)' % (formula, '; '.join(complaints), reference,
+                                                   ', '.join('%s %d' % item for item in result.items())))
+    print('%d lines, %d failing' % (len(formulas), failures))
+    sys.exit(1 if failures else 0)
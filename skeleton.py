@@ -1,173 +1,2369 @@
+import copy
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+from collections import OrderedDict
+from functools import lru_cache, partial
+
+try:
+    import numpy as np
+except ImportError:  # no finite model search
+    np = None
+
+try:
+    import sqlite3
+except ImportError:  # no result cache
+    sqlite3 = None
+
 MAX_CONSTANTS = 10
 
+# Upper bound on the number of distinct formulas whose type is remembered.
+# parse.cache_info() reports hits/misses/currsize so the bound can be tuned.
+PARSE_CACHE_SIZE = 4096
+
+# Upper bound on the number of interned formulas. When a line starts with
+# more, the formula tables and everything cached against formula ids are
+# cleared (see forget_formulas), so a long run does not keep growing.
+FORMULA_TABLE_SIZE = 1 << 14
+
+# How sat() stores a branch: 'set' (frozenset of formula ids) or 'bitset'
+# (arbitrary precision int with one bit per formula id)
+BRANCH_REPRESENTATION = 'set'
+
+# Rule scheduling policy used by sat(), one of SCHEDULES below
+SCHEDULE = 'alpha-first'
+
+# Order in which sat() looks at the worklists of pending formulas.
+# 'lexicographic' takes the pending formula that comes first in sorted()
+# order, as sat() used to. 'connective' keeps roughly that precedence (binary
+# formulas, then universal, then existential ones). 'alpha-first' applies the
+# non-branching rules first, then delta, then beta, then gamma, so work is not
+# duplicated into both children of a branching rule.
+SCHEDULES = {'lexicographic': None,
+             'connective': ['alpha', 'beta', 'gamma', 'delta'],
+             'alpha-first': ['alpha', 'delta', 'beta', 'gamma']}
+
+# Search engine behind sat(). 'stack' keeps a list of pending branches, each
+# its own copy; 'trail' keeps one mutable branch and an undo trail, so memory
+# grows with the depth of the search rather than with the number of branches.
+# 'parallel' runs the stack search on PARALLEL_WORKERS forked processes (all
+# cores when None) that steal branches from each other; NODE_BUDGET bounds
+# their nodes together, MEMORY_BUDGET the formulas each one holds. Where
+# processes cannot be forked, as in the workers of the -j batch mode, it is
+# the stack search.
+SEARCH = 'stack'
+PARALLEL_WORKERS = None
+
+# Decision procedure for lines that are purely propositional (parse() types
+# 6, 7 and 8): 'tableau', 'cdcl' (a clause learning solver run on a Tseitin
+# encoding of the formula), 'truth-table' (the formula evaluated on all 16
+# assignments of p, q, r, s at once) or 'bdd' (a reduced ordered BDD shared by
+# every formula of the run). First order lines always go to the tableau.
+PROPOSITIONAL_ENGINE = 'cdcl'
+
+# Conflicts before the first CDCL restart; later restarts follow the Luby
+# sequence scaled by this
+RESTART_INTERVAL = 64
+
+# Bound on the BDD apply cache (least recently used entries are evicted)
+BDD_CACHE_SIZE = 1 << 16
+
+# Decision procedure for first order lines: 'tableau'; 'models' to first
+# look for a finite model of size 1..MAX_CONSTANTS (needs NumPy) and only run
+# the tableau when none is found within MODEL_SEARCH_LIMIT interpretations per
+# domain size (interpretations are evaluated MODEL_BATCH at a time); or
+# 'ground' to ground the line over domains of size 1..MAX_CONSTANTS and hand
+# each grounding to the CDCL solver.
+FIRST_ORDER_ENGINE = 'tableau'
+MODEL_SEARCH_LIMIT = 1 << 18
+MODEL_BATCH = 1 << 12
+
+# Branch states already searched are remembered by a 64-bit Zobrist hash so
+# that the same branch is not expanded twice. At most VISITED_STATES hashes
+# are kept (least recently seen evicted first, 0 turns the check off). With
+# VERIFY_VISITED a hash hit is only trusted after comparing the exact state.
+VISITED_STATES = 1 << 16
+VERIFY_VISITED = False
+
+# First order lines are searched with constant limits 1, 2, 4, ... up to
+# MAX_CONSTANTS, stopping at the first limit that gives a definite answer
+# (STATISTICS['bound'] reports it). Branch states refuted at a small limit
+# are not searched again at the larger ones. False searches once with
+# MAX_CONSTANTS.
+CONSTANT_DEEPENING = True
+
+# Portfolio mode: PORTFOLIO lists engines, e.g. ['cdcl', 'bdd', 'tableau',
+# 'models', 'ground']. sat() runs each of them that fits the line (see
+# ENGINES) in its own forked process, takes the first definite answer and
+# terminates the others. The winner is STATISTICS['engine'], and
+# PORTFOLIO_WINS counts the wins per formula class and engine. Where no
+# process can be forked (no fork, or inside the daemonic workers of the -j
+# batch mode) the engines run one after another instead, and the first
+# definite answer is kept.
+ENGINES = {'propositional': ['tableau', 'cdcl', 'truth-table', 'bdd'],
+           'first order': ['tableau', 'models', 'ground']}
+PORTFOLIO = None
+PORTFOLIO_WINS = {}
+
+# Routing: with ROUTER on, sat() sends each line to the engine of its class
+# with the lowest estimated cost. COST_MODEL gives per engine the weights of
+# a linear estimate of log seconds over the features of line_features(); the
+# values are the fit bench.py --calibrate printed for input.txt and 400
+# generated lines. Each decision is logged at INFO on the 'tableau' logger.
+ROUTER = False
+COST_MODEL = {
+    'propositional': {
+        'tableau': (-9.8934, 0.0529, -0.0286, 0.0, 0.0),
+        'cdcl': (-10.141, 0.0614, 0.0203, 0.0, 0.0),
+        'truth-table': (-11.2156, 0.0377, -0.0002, 0.0, 0.0),
+        'bdd': (-11.5056, 0.0636, -0.0059, 0.0, 0.0)},
+    'first order': {
+        'tableau': (-10.8936, 0.5078, -0.6017, 1.1969, 0.0439),
+        'models': (-9.2729, 0.2146, -0.3063, 0.2236, -0.1816),
+        'ground': (-10.0606, 0.4027, -0.2319, 0.2476, 0.0275)}}
+LOGGER = logging.getLogger('tableau')
+
+# Result cache: with RESULT_CACHE the path of an SQLite file, sat() answers
+# lines it has answered before from the file, across runs and processes.
+# Entries are keyed by a hash of the canonical line, ENGINE_VERSION (bump it
+# when a change can alter answers) and every setting that can turn an
+# answer into 2 or back (MAX_CONSTANTS, the engines, SEARCH, SCHEDULE, the
+# model search limits, and COST_MODEL when routing), and hold the answer and
+# STATISTICS. Answers cut short by a budget are not stored. Every
+# RESULT_CACHE_BATCH stores the size is checked, and beyond
+# RESULT_CACHE_SIZE entries the least recently used are evicted down to
+# RESULT_CACHE_SIZE - RESULT_CACHE_BATCH. A hit only records its use when
+# the last record is more than RESULT_CACHE_TOUCH seconds old, so lookups
+# are reads and concurrent drivers do not queue behind each other.
+RESULT_CACHE = None
+RESULT_CACHE_SIZE = 100000
+RESULT_CACHE_BATCH = 1000
+RESULT_CACHE_TOUCH = 3600
+ENGINE_VERSION = 1
+BUDGETS = ['nodes', 'time', 'memory']
+
+# Resource budgets of one sat() call, None for no limit. NODE_BUDGET bounds
+# expanded tableau nodes (decisions and conflicts for the clause solver,
+# batches for the model search), TIME_BUDGET is in seconds and MEMORY_BUDGET
+# bounds the formulas held by the search at once (all branches on the stack,
+# the trail, or the clause database). When one runs out sat() answers 2, may
+# or may not be satisfiable. FORMULA_BUDGETS overrides them for single lines
+# under the names in BUDGETS, e.g. {'AxEyP(x,y)': {'nodes': 500, 'time': 0.5}}.
+NODE_BUDGET = None
+TIME_BUDGET = None
+MEMORY_BUDGET = None
+FORMULA_BUDGETS = {}
+
+# Counters of the last sat() call: nodes is the number of branches taken off
+# the stack and expanded, branches the number of open branches pushed on it,
+# revisits the number of branch states skipped as already searched, and
+# exhausted names the budget that ran out ('constants' when a branch needed
+# more than the constant limit allowed), or None. The clause solver adds
+# conflicts, the number of conflicts it learned a clause from.
+STATISTICS = {'nodes': 0, 'branches': 0, 'revisits': 0, 'exhausted': None}
+
+PROPOSITIONS = ['p', 'q', 'r', 's']
+PREDICATES = ['P', 'Q', 'R', 'S']
+VARIABLES = ['x', 'y', 'z', 'w']
+QUANTIFIERS = ['A', 'E']
+CONNECTIVES = ['/\\', '\\/', '=>']
+
+class Node:
+    # One subformula of a parsed line. start/end are offsets into the original
+    # string (end exclusive) so parsing never copies a substring. For binary
+    # nodes op is the offset of the main connective.
+    __slots__ = ('kind', 'type', 'start', 'end', 'op', 'children')
+
+    def __init__(self, kind, type, start, end, op=None, children=()):
+        self.kind = kind
+        self.type = type
+        self.start = start
+        self.end = end
+        self.op = op
+        self.children = children
+
+    def __repr__(self):
+        return 'Node(%s, %d, %d:%d)' % (self.kind, self.type, self.start, self.end)
+
+def tokenize(fmla):
+    # Single pass over the line. Returns a list of (token, offset) pairs, or
+    # None as soon as a character outside the grammar is met.
+    tokens = []
+    i = 0
+    while i < len(fmla):
+        if fmla[i:i + 2] in CONNECTIVES:
+            tokens.append((fmla[i:i + 2], i))
+            i += 2
+        elif fmla[i] in '()~,' or fmla[i] in PROPOSITIONS or fmla[i] in PREDICATES \
+                or fmla[i] in VARIABLES or fmla[i] in QUANTIFIERS:
+            tokens.append((fmla[i], i))
+            i += 1
+        else:
+            return None
+    return tokens
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_ast(fmla):
+    # Build the syntax tree of fmla in time linear in its length. Each node
+    # carries the same type code parse() reports; None means not a formula.
+    # The tree is the structural index of the formula: spans give matching
+    # parentheses and op the main connective, and it is cached per string.
+    tokens = tokenize(fmla)
+    if not tokens:
+        return None
+    node, pos = parse_tokens(tokens, 0)
+    if node is None or pos != len(tokens):
+        return None
+    return node
+
+def parse_tokens(tokens, pos):
+    # Recursive descent from tokens[pos]. Returns (node, next position), with
+    # node None when no formula of the grammar starts at pos.
+    negations = []
+    while pos < len(tokens) and tokens[pos][0] == '~':
+        negations.append(tokens[pos][1])
+        pos += 1
+    if pos >= len(tokens):
+        return None, pos
+
+    token, start = tokens[pos]
+    node = None
+
+    # Propositional variable
+    if token in PROPOSITIONS:
+        node = Node('prop', 6, start, start + 1)
+        pos += 1
+
+    # Atom P(v,v)
+    elif token in PREDICATES:
+        shape = [t for t, _ in tokens[pos + 1:pos + 6]]
+        if len(shape) == 5 and shape[0] == '(' and shape[1] in VARIABLES and \
+                shape[2] == ',' and shape[3] in VARIABLES and shape[4] == ')':
+            node = Node('atom', 1, start, start + 6)
+            pos += 6
+
+    # Binary connective (A*B)
+    elif token == '(':
+        left, pos = parse_tokens(tokens, pos + 1)
+        if left is None or pos >= len(tokens) or tokens[pos][0] not in CONNECTIVES:
+            return None, pos
+        op = tokens[pos][1]
+        right, pos = parse_tokens(tokens, pos + 1)
+        if right is None or pos >= len(tokens) or tokens[pos][0] != ')':
+            return None, pos
+        if left.type in [6, 7, 8] and right.type in [6, 7, 8]:
+            node_type = 8
+        else:
+            node_type = 5
+        node = Node('bin', node_type, start, tokens[pos][1] + 1, op, (left, right))
+        pos += 1
+
+    # Quantifier Av / Ev over a first order formula
+    elif token in QUANTIFIERS:
+        if pos + 1 < len(tokens) and tokens[pos + 1][0] in VARIABLES:
+            body, pos = parse_tokens(tokens, pos + 2)
+            if body is not None and body.type in [1, 2, 3, 4, 5]:
+                node = Node('quant', 3 if token == 'A' else 4, start, body.end, children=(body,))
+
+    if node is None:
+        return None, pos
+
+    # Negations are applied innermost first. A negated first order negation is
+    # not in the grammar, so ~~P(x,x) is rejected just like parse() always did.
+    for offset in reversed(negations):
+        if node.type in [6, 7, 8]:
+            node = Node('neg', 7, offset, node.end, children=(node,))
+        elif node.type in [1, 3, 4, 5]:
+            node = Node('neg', 2, offset, node.end, children=(node,))
+        else:
+            return None, pos
+    return node, pos
+
+# Classification is memoised: sat() reclassifies every formula of a branch on
+# each iteration, and once more on formula[1:] for negations, so the same
+# strings come back again and again. Least recently used entries are evicted.
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse(fmla):
-    # Check if it's a propositional variable
-    if fmla in ['p', 'q', 'r', 's']:
-        return 6
-    
-    # Check for negations
-    if fmla.startswith("~"):
-        sub_fmla = fmla[1:]
-        sub_type = parse(sub_fmla)
-        if sub_type in [6, 7, 8]:
-            return 7
-        elif sub_type in [1, 3, 4, 5]:
-            return 2
-    
-    # Check for binary connectives
-    if fmla.startswith("(") and fmla.endswith(")"):
-        op_index = find_connective_index(fmla)
-        if op_index:
-            lhs_formula = fmla[1:op_index]
-            rhs_formula = fmla[op_index + 2:-1]
-            lhs_type = parse(lhs_formula)
-            rhs_type = parse(rhs_formula)
-            
-            if lhs_type in [6, 7, 8] and rhs_type in [6, 7, 8]:
-                return 8
-            elif lhs_type != 0 and rhs_type != 0:
-                return 5
-    
-    # Handle quantifiers
-    if len(fmla) > 2 and fmla[0] in ['E', 'A']:
-        variable = fmla[1]
-        if variable in ['x', 'y', 'z', 'w']:
-            sub_formula = fmla[2:]
-            sub_type = parse(sub_formula)
-            if sub_type in [1, 2, 3, 4, 5]:
-                return 3 if fmla[0] == 'A' else 4
-    
-    # Check for atoms
-    if (len(fmla) == 6 and fmla[0] in ['P', 'Q', 'R', 'S'] and 
-        fmla[1] == '(' and fmla[-1] == ')' and
-        fmla[2] in ['x', 'y', 'z', 'w'] and fmla[4] in ['x', 'y', 'z', 'w'] and
-        fmla[3] == ','):
-        return 1
-    
-    return 0
+    node = parse_ast(fmla)
+    return node.type if node is not None else 0
 
-def find_connective_index(fmla):
-    depth = 0
-    for i in range(len(fmla)):
-        if fmla[i] == '(':
-            depth += 1
-        elif fmla[i] == ')':
-            depth -= 1
-        elif depth == 1 and fmla[i:i+2] in ['/\\', '\\/', '=>']:
-            return i
-    return None
+def main_connective(fmla):
+    # Offset of the main connective of a binary formula, None otherwise
+    node = parse_ast(fmla)
+    return node.op if node is not None else None
 
 def lhs(fmla):
-    op_index = find_connective_index(fmla)
+    op_index = main_connective(fmla)
     return fmla[1:op_index] if op_index else ''
 
 def con(fmla):
-    op_index = find_connective_index(fmla)
+    op_index = main_connective(fmla)
     return fmla[op_index:op_index + 2] if op_index else ''
 
 def rhs(fmla):
-    op_index = find_connective_index(fmla)
+    op_index = main_connective(fmla)
     return fmla[op_index + 2:-1] if op_index else ''
 
+# Interned formulas. Every distinct subformula the tableau meets is hash-consed
+# into a node with a small integer id; nodes are tuples over child ids:
+#   ('prop', p)  ('atom', P, t1, t2)  ('~', a)  (connective, a, b)  (A/E, v, a)
+# Terms are variables or constants 'c0', 'c1', ... Branches hold ids, so equal
+# formulas are equal integers and a complement is found with one dict lookup.
+NODE_IDS = {}
+NODES = []
+NODE_TEXT = []
+NEGATION = {}       # id -> id of its negation, once that node exists
+SUBSTITUTIONS = {}  # (id, variable, constant) -> id
+TEMPLATES = {}      # (id, variable) -> substitution template, see template()
+EXPANSIONS = {}     # id -> tableau rule, see expansion()
+CONSTANTS = {}      # id -> frozenset of constants occurring in the formula
+
+def forget_formulas():
+    # Clear every table keyed by formula id. Ids handed out before are
+    # invalid afterwards, so this only runs between lines. The BDD unique
+    # table is kept: it is shared by the whole run and does not hold ids.
+    for table in [NODE_IDS, NODES, NODE_TEXT, NEGATION, SUBSTITUTIONS, TEMPLATES, EXPANSIONS, CONSTANTS,
+                  ZOBRIST_PAIR_KEYS, FEATURES, TRUTH_TABLES, BDD_ROOTS, SYMBOLS, FREE_VARIABLES]:
+        table.clear()
+    formula_id.cache_clear()
+
+def intern_node(node):
+    fid = NODE_IDS.get(node)
+    if fid is None:
+        fid = len(NODES)
+        NODE_IDS[node] = fid
+        NODES.append(node)
+        NODE_TEXT.append(node_text(node))
+        if node[0] == '~':
+            NEGATION[node[1]] = fid
+    return fid
+
+def node_text(node):
+    kind = node[0]
+    if kind == 'prop' or kind == 'raw':
+        return node[1]
+    if kind == 'atom':
+        return '%s(%s,%s)' % node[1:]
+    if kind == '~':
+        return '~' + NODE_TEXT[node[1]]
+    if kind in CONNECTIVES:
+        return '(' + NODE_TEXT[node[1]] + kind + NODE_TEXT[node[2]] + ')'
+    return kind + node[1] + NODE_TEXT[node[2]]
+
+def formula_text(fid):
+    return NODE_TEXT[fid]
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def formula_id(fmla):
+    # Intern a formula string. Strings outside the grammar become opaque
+    # 'raw' nodes, which the tableau treats as literals.
+    node = parse_ast(fmla)
+    if node is None:
+        return intern_node(('raw', fmla))
+    return intern_ast(fmla, node)
+
+def intern_ast(fmla, node):
+    if node.kind == 'prop':
+        return intern_node(('prop', fmla[node.start]))
+    if node.kind == 'atom':
+        return intern_node(('atom', fmla[node.start], fmla[node.start + 2], fmla[node.start + 4]))
+    if node.kind == 'neg':
+        return intern_node(('~', intern_ast(fmla, node.children[0])))
+    if node.kind == 'bin':
+        return intern_node((fmla[node.op:node.op + 2], intern_ast(fmla, node.children[0]),
+                            intern_ast(fmla, node.children[1])))
+    return intern_node((fmla[node.start], fmla[node.start + 1], intern_ast(fmla, node.children[0])))
+
+def negate(fid):
+    negation = NEGATION.get(fid)
+    if negation is None:
+        negation = intern_node(('~', fid))
+    return negation
+
+def template(fid, var):
+    # Formula fid compiled for substituting var, once per (fid, var): the id
+    # itself when var has no free occurrence in it (a quantifier binding var
+    # shadows it, as in make_substitution in test5.py), otherwise the node
+    # with its children compiled and None at the term positions holding var.
+    key = (fid, var)
+    result = TEMPLATES.get(key)
+    if result is None:
+        node = NODES[fid]
+        result = fid
+        if node[0] == 'atom':
+            if var in node[2:]:
+                result = ('atom', node[1], None if node[2] == var else node[2],
+                          None if node[3] == var else node[3])
+        elif node[0] == '~':
+            sub = template(node[1], var)
+            if sub != node[1]:
+                result = ('~', sub)
+        elif node[0] in CONNECTIVES:
+            left = template(node[1], var)
+            right = template(node[2], var)
+            if left != node[1] or right != node[2]:
+                result = (node[0], left, right)
+        elif node[0] in QUANTIFIERS and node[1] != var:
+            sub = template(node[2], var)
+            if sub != node[2]:
+                result = (node[0], node[1], sub)
+        TEMPLATES[key] = result
+    return result
+
+def fill(compiled, const):
+    # Intern the formula a template stands for with const in the holes; the
+    # parts without var are shared ids and are not visited
+    if type(compiled) is int:
+        return compiled
+    kind = compiled[0]
+    if kind == 'atom':
+        return intern_node(('atom', compiled[1], const if compiled[2] is None else compiled[2],
+                            const if compiled[3] is None else compiled[3]))
+    if kind == '~':
+        return intern_node(('~', fill(compiled[1], const)))
+    if kind in CONNECTIVES:
+        return intern_node((kind, fill(compiled[1], const), fill(compiled[2], const)))
+    return intern_node((kind, compiled[1], fill(compiled[2], const)))
+
+def substitute(fid, var, const):
+    # Replace the free occurrences of var in formula fid by const
+    key = (fid, var, const)
+    result = SUBSTITUTIONS.get(key)
+    if result is None:
+        result = SUBSTITUTIONS[key] = fill(template(fid, var), const)
+    return result
+
+def constants_of(fid):
+    result = CONSTANTS.get(fid)
+    if result is None:
+        node = NODES[fid]
+        if node[0] == 'atom':
+            result = frozenset(t for t in node[2:] if t not in VARIABLES)
+        elif node[0] == '~':
+            result = constants_of(node[1])
+        elif node[0] in CONNECTIVES:
+            result = constants_of(node[1]) | constants_of(node[2])
+        elif node[0] in QUANTIFIERS:
+            result = constants_of(node[2])
+        else:
+            result = frozenset()
+        CONSTANTS[fid] = result
+    return result
+
+def expansion(fid):
+    # Tableau rule for formula fid, cached on the node:
+    #   ('literal',)
+    #   ('alpha', ids)                  all ids go on the branch
+    #   ('beta', ids)                   one new branch per id
+    #   ('gamma', var, body, negated)   instantiate with every constant
+    #   ('delta', var, body, negated)   instantiate with a fresh constant
+    # where an instance is body[var := c], negated when the rule came from
+    # ~Ex or ~Ax.
+    rule = EXPANSIONS.get(fid)
+    if rule is None:
+        node = NODES[fid]
+        rule = ('literal',)
+        if node[0] == '/\\':
+            rule = ('alpha', (node[1], node[2]))
+        elif node[0] == '\\/':
+            rule = ('beta', (node[1], node[2]))
+        elif node[0] == '=>':
+            rule = ('beta', (negate(node[1]), node[2]))
+        elif node[0] == 'A':
+            rule = ('gamma', node[1], node[2], False)
+        elif node[0] == 'E':
+            rule = ('delta', node[1], node[2], False)
+        elif node[0] == '~':
+            sub = NODES[node[1]]
+            if sub[0] == '~':  # ~~A = A
+                rule = ('alpha', (sub[1],))
+            elif sub[0] == '/\\':  # ~(A /\ B) = ~A \/ ~B
+                rule = ('beta', (negate(sub[1]), negate(sub[2])))
+            elif sub[0] == '\\/':  # ~(A \/ B) = ~A /\ ~B
+                rule = ('alpha', (negate(sub[1]), negate(sub[2])))
+            elif sub[0] == '=>':  # ~(A => B) = A /\ ~B
+                rule = ('alpha', (sub[1], negate(sub[2])))
+            elif sub[0] == 'A':  # ~AxA = Ex~A
+                rule = ('delta', sub[1], sub[2], True)
+            elif sub[0] == 'E':  # ~ExA = Ax~A
+                rule = ('gamma', sub[1], sub[2], True)
+        EXPANSIONS[fid] = rule
+    return rule
+
+def instance(rule, const):
+    fid = substitute(rule[2], rule[1], const)
+    return negate(fid) if rule[3] else fid
+
+def literal_of(fid):
+    # (atom id, sign) when fid is a literal p, ~p, P(a,b) or ~P(a,b); None
+    # for every formula that still has a rule to apply
+    node = NODES[fid]
+    if node[0] in ['prop', 'atom', 'raw']:
+        return fid, True
+    if node[0] == '~' and NODES[node[1]][0] in ['prop', 'atom', 'raw']:
+        return node[1], False
+    return None
+
+# Pending formulas of a branch are kept in one worklist per rule kind. Each
+# worklist is a linked list of (formula id, rest) pairs, so a child branch
+# shares it with its parent and queueing or consuming a formula is O(1).
+# Literals never enter a worklist, so they are never looked at again.
+def iterate(worklist):
+    while worklist is not None:
+        yield worklist[0]
+        worklist = worklist[1]
+
+def unlink(worklist, fid):
+    # The worklist without fid: the cells before it are copied, the rest is
+    # shared. Iterative, since the 'lexicographic' schedule can consume a
+    # formula from deep inside a long worklist.
+    prefix = []
+    while worklist is not None and worklist[0] != fid:
+        prefix.append(worklist[0])
+        worklist = worklist[1]
+    if worklist is not None:
+        worklist = worklist[1]
+    for head in reversed(prefix):
+        worklist = (head, worklist)
+    return worklist
+
+def schedule(pending, removed, added):
+    # New worklists without the formula a rule consumed and with every formula
+    # in added that still has a rule to apply
+    pending = dict(pending)
+    if removed is not None:
+        kind = expansion(removed)[0]
+        pending[kind] = unlink(pending[kind], removed)
+    for fid in added:
+        kind = expansion(fid)[0]
+        if kind != 'literal':
+            pending[kind] = (fid, pending[kind])
+    return pending
+
+# Zobrist hashing: every formula id, and every (universal formula, constant)
+# pair instantiated on a branch, gets a random 64-bit key. The hash of a
+# branch is the xor of the keys of what is on it, so a rule updates it with
+# one xor per formula it removes or adds instead of rehashing the branch.
+ZOBRIST_RANDOM = random.Random(0)
+ZOBRIST_KEYS = []
+ZOBRIST_PAIR_KEYS = {}
+
+def zobrist_key(fid):
+    while len(ZOBRIST_KEYS) <= fid:
+        ZOBRIST_KEYS.append(ZOBRIST_RANDOM.getrandbits(64))
+    return ZOBRIST_KEYS[fid]
+
+def zobrist_pair_key(fid, const):
+    key = ZOBRIST_PAIR_KEYS.get((fid, const))
+    if key is None:
+        key = ZOBRIST_PAIR_KEYS[(fid, const)] = ZOBRIST_RANDOM.getrandbits(64)
+    return key
+
+def rehash(state_hash, removed, added):
+    if removed is not None:
+        state_hash ^= zobrist_key(removed)
+    for fid in added:
+        state_hash ^= zobrist_key(fid)
+    return state_hash
+
+class VisitedStates:
+    # Bounded set of branch state hashes, evicting the least recently seen
+    def __init__(self, size=VISITED_STATES, verify=VERIFY_VISITED):
+        self.size = size
+        self.verify = verify
+        self.states = OrderedDict()
+
+    def seen(self, state_hash, exact):
+        # Record a state; True if it had been recorded before. exact() gives
+        # the full state and is only called when verification is on.
+        if self.size <= 0:
+            return False
+        state = exact() if self.verify else None
+        if state_hash in self.states and (not self.verify or self.states[state_hash] == state):
+            self.states.move_to_end(state_hash)
+            return True
+        self.states[state_hash] = state
+        self.states.move_to_end(state_hash)
+        if len(self.states) > self.size:
+            self.states.popitem(last=False)
+        return False
+
+NO_PENDING = {'alpha': None, 'beta': None, 'gamma': None, 'delta': None}
+
+class SetBranch:
+    # Branch stored as a frozenset of formula ids, plus the atoms occurring
+    # positively and negatively on it. The literal sets are only updated for
+    # the formulas a rule adds, and closed is set the moment a literal meets
+    # its complement, so closure never needs a scan of the branch. The
+    # constants on the branch are constant(0) .. constant(constants - 1).
+    __slots__ = ('formulas', 'positive', 'negative', 'closed', 'pending', 'hash', 'constants')
+
+    def __init__(self, formulas=(), positive=frozenset(), negative=frozenset(), closed=False,
+                 pending=NO_PENDING, hash=0, constants=0):
+        self.formulas = frozenset(formulas)
+        self.positive = positive
+        self.negative = negative
+        self.closed = closed
+        self.pending = pending
+        self.hash = hash
+        self.constants = constants
+
+    @classmethod
+    def of(cls, formulas):
+        return cls().expand(None, formulas, constant_count(formulas))
+
+    def __iter__(self):
+        return iter(self.formulas)
+
+    def __contains__(self, fid):
+        return fid in self.formulas
+
+    def __len__(self):
+        return len(self.formulas)
+
+    def expand(self, removed, added, constants=None):
+        # New branch without formula removed (None keeps everything), with
+        # the ids in added and, unless None, constants constants
+        added = [fid for fid in set(added) if fid not in self.formulas]
+        formulas = self.formulas - {removed} if removed is not None else self.formulas
+        positive = self.positive
+        negative = self.negative
+        closed = self.closed
+        for fid in added:
+            literal = literal_of(fid)
+            if literal is None:
+                continue
+            atom, sign = literal
+            if sign:
+                closed = closed or atom in negative
+                positive = positive | {atom}
+            else:
+                closed = closed or atom in positive
+                negative = negative | {atom}
+        return SetBranch(formulas.union(added), positive, negative, closed,
+                         schedule(self.pending, removed, added), rehash(self.hash, removed, added),
+                         self.constants if constants is None else constants)
+
+    def is_closed(self):
+        return self.closed
+
+    def pending_formulas(self, kind):
+        return iterate(self.pending[kind])
+
+# Bit positions of the formulas on bitset branches. Formula ids are global
+# to the process, so masks indexed by them would grow as wide as everything
+# interned so far; positions are handed out densely instead, and sat()
+# starts them afresh for every line.
+BIT_POSITIONS = {}  # id -> bit position
+BIT_FORMULAS = []   # bit position -> id
+
+def bit_position(fid):
+    position = BIT_POSITIONS.get(fid)
+    if position is None:
+        position = BIT_POSITIONS[fid] = len(BIT_FORMULAS)
+        BIT_FORMULAS.append(fid)
+    return position
+
+class BitsetBranch:
+    # Branch stored as ints over bit positions: the bit of a formula is set in
+    # mask when it is on the branch, the bit of an atom in positive / negative
+    # when it occurs as a positive / negated literal. Adding, removing and
+    # merging formulas are single int operations; closure is positive &
+    # negative and is tested only against the literals a rule adds.
+    # constants is as for SetBranch.
+    __slots__ = ('mask', 'positive', 'negative', 'closed', 'pending', 'hash', 'constants')
+
+    def __init__(self, mask=0, positive=0, negative=0, closed=False, pending=NO_PENDING, hash=0,
+                 constants=0):
+        self.mask = mask
+        self.positive = positive
+        self.negative = negative
+        self.closed = closed
+        self.pending = pending
+        self.hash = hash
+        self.constants = constants
+
+    @classmethod
+    def of(cls, formulas):
+        return cls().expand(None, formulas, constant_count(formulas))
+
+    def __iter__(self):
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            yield BIT_FORMULAS[low.bit_length() - 1]
+            mask ^= low
+
+    def __contains__(self, fid):
+        position = BIT_POSITIONS.get(fid)
+        return position is not None and self.mask >> position & 1 == 1
+
+    def __len__(self):
+        return bin(self.mask).count('1')
+
+    def expand(self, removed, added, constants=None):
+        added = [fid for fid in set(added) if fid not in self]
+        mask = self.mask
+        positive = self.positive
+        negative = self.negative
+        if removed is not None:
+            mask &= ~(1 << bit_position(removed))
+        for fid in added:
+            mask |= 1 << bit_position(fid)
+            literal = literal_of(fid)
+            if literal is None:
+                continue
+            atom, sign = literal
+            if sign:
+                positive |= 1 << bit_position(atom)
+            else:
+                negative |= 1 << bit_position(atom)
+        return BitsetBranch(mask, positive, negative, self.closed or positive & negative != 0,
+                            schedule(self.pending, removed, added), rehash(self.hash, removed, added),
+                            self.constants if constants is None else constants)
+
+    def is_closed(self):
+        return self.closed
+
+    def pending_formulas(self, kind):
+        return iterate(self.pending[kind])
+
+BRANCH_TYPES = {'set': SetBranch, 'bitset': BitsetBranch}
+
+# Branches introduce constants in order, so a branch only keeps their number:
+# with n constants they are constant(0) .. constant(n - 1) and the next fresh
+# one is constant(n).
+CONSTANT_NAMES = []
+
+def constant(i):
+    while len(CONSTANT_NAMES) <= i:
+        CONSTANT_NAMES.append(f'c{len(CONSTANT_NAMES)}')
+    return CONSTANT_NAMES[i]
+
+def constant_count(fids):
+    # Number of constants a branch starting with fids holds
+    return max((int(const[1:]) + 1 for fid in fids for const in constants_of(fid)), default=0)
+
+# Gamma ledger of a stack search branch: how many constants each universal
+# formula has been instantiated with, as a persistent linked list of
+# ((formula, count), rest) cells, newest first. A child branch adds one cell
+# in front of its parent's ledger and shares the rest. Constants are taken in
+# order, so formula has been instantiated with constant(i) iff i < count.
+
+def ledger_counts(ledger, formulas):
+    # Latest count of each of formulas (missing ones are 0), reading the
+    # ledger only as far as needed
+    counts = {}
+    wanted = len(formulas)
+    while ledger is not None and len(counts) < wanted:
+        (fid, count), ledger = ledger
+        if fid in formulas and fid not in counts:
+            counts[fid] = count
+    return counts
+
+def fair_instantiation(formulas, counts, constants):
+    # Round robin: (formula, i) for the universal formula instantiated with
+    # the fewest of the first constants constants, the earliest in formulas
+    # on ties, so every formula gets constant(i) before any gets a later one
+    # and none waits behind another. None once every pair is done.
+    best = None
+    for fid in formulas:
+        count = counts.get(fid, 0)
+        if count < constants and (best is None or count < best[1]):
+            best = fid, count
+    return best
+
+def fresh_instance(rule, count):
+    # Instance of an existential rule with the fresh constant(count), and the
+    # number of constants once it is on the branch (unchanged when the
+    # variable does not occur, so the constant is not used up)
+    const = constant(count)
+    fid = instance(rule, const)
+    return fid, count + 1 if const in constants_of(fid) else count
+
 def theory(fmla):
     return {fmla}
 
-def has_contradiction(branch):
-    for formula in branch:
-        if formula.startswith('~') and formula[1:] in branch:
-            return True
-        elif '~' + formula in branch:
-            return True
-    return False
-
-def needs_expansion(formula):
-    formula_type = parse(formula)
-    return formula_type in [2, 3, 4, 7, 8]  # negation, quantifiers, binary connectives need expansion
-
-def sat(tableau):
-    while tableau:
-        current_branch = tableau.pop()
-        
-        # Check for contradictions
-        if has_contradiction(current_branch):
+def parse_cache_info():
+    # Hit/miss counters of the classification cache behind parse()
+    return parse.cache_info()
+
+def parse_cache_clear():
+    parse.cache_clear()
+    parse_ast.cache_clear()
+
+class TrailBranch:
+    # The single branch of the trail search. Every change is recorded on
+    # trail, so undo(mark) puts the branch back the way it was when
+    # len(trail) was mark. Worklists are plain lists used as stacks.
+    def __init__(self):
+        self.formulas = set()
+        self.positive = set()
+        self.negative = set()
+        self.pending = {kind: [] for kind in NO_PENDING}
+        self.instantiated = {}  # gamma ledger: universal formula -> count
+        self.trail = []
+        self.hash = 0
+        self.constants = 0
+
+    def __iter__(self):
+        return iter(self.formulas)
+
+    def __contains__(self, fid):
+        return fid in self.formulas
+
+    def __len__(self):
+        return len(self.formulas)
+
+    def pending_formulas(self, kind):
+        return reversed(self.pending[kind])
+
+    def add(self, added):
+        # Put formulas on the branch; True if that closed it
+        closed = False
+        for fid in added:
+            if fid in self.formulas:
+                continue
+            self.formulas.add(fid)
+            self.hash ^= zobrist_key(fid)
+            self.trail.append(('add', fid))
+            literal = literal_of(fid)
+            if literal is None:
+                self.pending[expansion(fid)[0]].append(fid)
+            else:
+                atom, sign = literal
+                if sign:
+                    closed = closed or atom in self.negative
+                    self.positive.add(atom)
+                else:
+                    closed = closed or atom in self.positive
+                    self.negative.add(atom)
+        return closed
+
+    def consume(self, fid):
+        # Take formula fid off the branch once its rule has been applied
+        worklist = self.pending[expansion(fid)[0]]
+        index = len(worklist) - 1 if worklist[-1] == fid else worklist.index(fid)
+        del worklist[index]
+        self.formulas.discard(fid)
+        self.hash ^= zobrist_key(fid)
+        self.trail.append(('consume', fid, index))
+
+    def introduce(self, count):
+        # Set the number of constants on the branch
+        self.trail.append(('constants', self.constants))
+        self.constants = count
+
+    def instantiate(self, fid, i):
+        # Record that fid has been instantiated with constant(i)
+        self.trail.append(('instantiate', fid, self.instantiated.get(fid, 0)))
+        self.instantiated[fid] = i + 1
+        self.hash ^= zobrist_pair_key(fid, constant(i))
+
+    def undo(self, mark):
+        while len(self.trail) > mark:
+            entry = self.trail.pop()
+            if entry[0] == 'add':
+                fid = entry[1]
+                self.formulas.discard(fid)
+                self.hash ^= zobrist_key(fid)
+                literal = literal_of(fid)
+                if literal is None:
+                    self.pending[expansion(fid)[0]].pop()
+                elif literal[1]:
+                    self.positive.discard(literal[0])
+                else:
+                    self.negative.discard(literal[0])
+            elif entry[0] == 'consume':
+                fid = entry[1]
+                self.formulas.add(fid)
+                self.hash ^= zobrist_key(fid)
+                self.pending[expansion(fid)[0]].insert(entry[2], fid)
+            elif entry[0] == 'constants':
+                self.constants = entry[1]
+            else:
+                fid, count = entry[1], entry[2]
+                self.hash ^= zobrist_pair_key(fid, constant(count))
+                if count:
+                    self.instantiated[fid] = count
+                else:
+                    del self.instantiated[fid]
+
+def candidates(branch):
+    # (rule kind, formula) pairs of the pending formulas of branch, in the
+    # order the scheduling policy wants them tried
+    order = SCHEDULES[SCHEDULE]
+    if order is None:
+        pending = [(kind, formula) for kind in NO_PENDING for formula in branch.pending_formulas(kind)]
+        yield from sorted(pending, key=lambda item: formula_text(item[1]))
+        return
+    for kind in order:
+        for formula in branch.pending_formulas(kind):
+            yield kind, formula
+
+class BudgetExhausted(Exception):
+    pass
+
+class Budget:
+    # Cooperative limits: the search loops call charge() once per node with
+    # the number of formulas they currently hold, and it raises
+    # BudgetExhausted once a limit is passed. The clock is read every 64
+    # charges to keep the check cheap.
+    def __init__(self, nodes=None, seconds=None, memory=None):
+        self.nodes = nodes
+        self.memory = memory
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.spent = 0
+
+    def charge(self, held=0):
+        self.spent += 1
+        if self.nodes is not None and self.spent > self.nodes:
+            raise BudgetExhausted('nodes')
+        if self.memory is not None and held > self.memory:
+            raise BudgetExhausted('memory')
+        if self.deadline is not None and self.spent % 64 == 0 and time.monotonic() > self.deadline:
+            raise BudgetExhausted('time')
+
+def budget_for(tableau):
+    # Run-wide budgets, overridden by FORMULA_BUDGETS for the formulas given
+    limits = {'nodes': NODE_BUDGET, 'time': TIME_BUDGET, 'memory': MEMORY_BUDGET}
+    for branch in tableau:
+        for formula in branch:
+            overrides = FORMULA_BUDGETS.get(formula, {})
+            unknown = sorted(set(overrides) - set(BUDGETS))
+            if unknown:
+                raise ValueError('unknown budget %s for %s in FORMULA_BUDGETS, expected one of %s'
+                                 % (', '.join(map(repr, unknown)), formula, ', '.join(BUDGETS)))
+            limits.update(overrides)
+    return Budget(limits['nodes'], limits['time'], limits['memory'])
+
+def push(tableau, branch, ledger, ledger_hash):
+    # Closed branches are dropped here, so they never reach the stack.
+    # ledger_hash is the Zobrist hash of the instantiated pairs.
+    if not branch.closed:
+        tableau.append((branch, ledger, ledger_hash))
+        STATISTICS['branches'] += 1
+
+def sat(tableau, budget=None):
+    # Work on interned ids. budget (a Budget) replaces the configured limits.
+    STATISTICS.clear()
+    STATISTICS.update(nodes=0, branches=0, revisits=0, exhausted=None)
+    BIT_POSITIONS.clear()
+    BIT_FORMULAS.clear()
+    if len(NODES) > FORMULA_TABLE_SIZE:
+        forget_formulas()
+    key = result_key(tableau) if RESULT_CACHE and sqlite3 is not None else None
+    if key is not None:
+        cached = cached_result(key)
+        if cached is not None:
+            STATISTICS.update(cached[1])
+            return cached[0]
+    if budget is None:
+        budget = budget_for(tableau)
+    try:
+        engines = [engine for engine in PORTFOLIO or [] if engine in ENGINES[formula_class(tableau)]]
+        if len(engines) == 1:
+            answer = decide(tableau, budget, engines[0])
+        elif engines and 'fork' in multiprocessing.get_all_start_methods() and \
+                not multiprocessing.current_process().daemon:
+            answer = sat_portfolio(tableau, budget, engines)
+        elif engines:
+            answer = sat_in_turn(tableau, budget, engines)
+        else:
+            answer = decide(tableau, budget, route(tableau) if ROUTER else None)
+    except BudgetExhausted as exhausted:
+        STATISTICS['exhausted'] = exhausted.args[0]
+        return 2
+    if key is not None and STATISTICS['exhausted'] not in BUDGETS:
+        store_result(key, answer)
+    return answer
+
+def canonical_text(fid, bound=()):
+    # Text of formula fid with every bound variable renamed after the depth
+    # of its quantifier, so lines equal up to renaming share one text
+    node = NODES[fid]
+    if node[0] == 'atom':
+        terms = ['#%d' % (len(bound) - 1 - bound[::-1].index(t)) if t in bound else t for t in node[2:]]
+        return '%s(%s,%s)' % (node[1], terms[0], terms[1])
+    if node[0] == '~':
+        return '~' + canonical_text(node[1], bound)
+    if node[0] in CONNECTIVES:
+        return '(' + canonical_text(node[1], bound) + node[0] + canonical_text(node[2], bound) + ')'
+    if node[0] in QUANTIFIERS:
+        return node[0] + canonical_text(node[2], bound + (node[1],))
+    return NODE_TEXT[fid]
+
+def result_key(tableau):
+    branches = sorted(sorted(canonical_text(formula_id(formula)) for formula in branch) for branch in tableau)
+    # Every setting that can move an answer between definite and 2
+    settings = (ENGINE_VERSION, MAX_CONSTANTS, PROPOSITIONAL_ENGINE, FIRST_ORDER_ENGINE, SEARCH, SCHEDULE,
+                CONSTANT_DEEPENING, MODEL_SEARCH_LIMIT, MODEL_BATCH, ROUTER, COST_MODEL if ROUTER else None,
+                tuple(PORTFOLIO or ()))
+    return hashlib.sha256(repr((settings, branches)).encode()).hexdigest()
+
+CACHE_CONNECTION = [None, None, 0]  # process id, connection, stores since the size check
+
+def cache_connection():
+    # One connection per process: a forked worker must not use its parent's
+    if CACHE_CONNECTION[0] != os.getpid():
+        connection = sqlite3.connect(RESULT_CACHE, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS results '
+                           '(key TEXT PRIMARY KEY, answer INTEGER, statistics TEXT, used REAL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+        connection.commit()
+        CACHE_CONNECTION[:] = [os.getpid(), connection, 0]
+    return CACHE_CONNECTION[1]
+
+def cached_result(key):
+    # (answer, statistics) stored for key, or None
+    connection = cache_connection()
+    row = connection.execute('SELECT answer, statistics, used FROM results WHERE key = ?', (key,)).fetchone()
+    if row is None:
+        return None
+    now = time.time()
+    if now - row[2] > RESULT_CACHE_TOUCH:
+        with connection:
+            connection.execute('UPDATE results SET used = ? WHERE key = ?', (now, key))
+    return row[0], json.loads(row[1])
+
+def store_result(key, answer):
+    connection = cache_connection()
+    with connection:
+        connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                           (key, answer, json.dumps(STATISTICS), time.time()))
+    CACHE_CONNECTION[2] += 1
+    if CACHE_CONNECTION[2] >= RESULT_CACHE_BATCH:
+        CACHE_CONNECTION[2] = 0
+        evict(connection)
+
+def evict(connection):
+    # Drop the least recently used entries in one batch once there are too
+    # many
+    with connection:
+        count = connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        if count > RESULT_CACHE_SIZE:
+            excess = count - max(RESULT_CACHE_SIZE - RESULT_CACHE_BATCH, 0)
+            connection.execute('DELETE FROM results WHERE key IN '
+                               '(SELECT key FROM results ORDER BY used LIMIT ?)', (excess,))
+
+def formula_class(tableau):
+    if all(parse(formula) in [6, 7, 8] for branch in tableau for formula in branch):
+        return 'propositional'
+    return 'first order'
+
+def sat_portfolio(tableau, budget, engines):
+    # Race the engines; 2 with the statistics of the last one to finish when
+    # none of them is definite. An engine that raised or whose process died
+    # is logged and left out, and RuntimeError is raised if none is left.
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    pending = {name: context.Process(target=portfolio_worker, args=(name, tableau, budget, results))
+               for name in engines}
+    processes = list(pending.values())
+    for process in processes:
+        process.start()
+    answer = None
+    exhausted = None
+    counters = {}
+    while pending:
+        try:
+            name, result, reported = results.get(timeout=0.1)
+        except queue.Empty:
+            # A process that ended without reporting was killed
+            for name, process in list(pending.items()):
+                if process.exitcode is not None and results.empty():
+                    del pending[name]
+                    LOGGER.warning('portfolio engine %s died with exit code %s', name, process.exitcode)
+            continue
+        del pending[name]
+        if result is None:
+            LOGGER.warning('portfolio engine %s failed', name)
+            continue
+        answer = result
+        counters = reported
+        if answer in [0, 1]:
+            break
+        if counters.get('exhausted') in BUDGETS:
+            exhausted = counters['exhausted']
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+    if answer is None:
+        raise RuntimeError('every portfolio engine failed')
+    STATISTICS.update(counters)
+    if answer not in [0, 1]:
+        # A budget cut the race short unless every engine was indefinite
+        # on its own terms
+        STATISTICS['exhausted'] = exhausted or STATISTICS['exhausted']
+        return 2
+    record_win(tableau, name)
+    return answer
+
+def sat_in_turn(tableau, budget, engines):
+    # The portfolio without processes: each engine runs on its own copy of
+    # budget, as a forked one would, until one is definite. Failures are
+    # logged and left out as in sat_portfolio.
+    answer = None
+    exhausted = None
+    for name in engines:
+        STATISTICS.update(nodes=0, branches=0, revisits=0, exhausted=None)
+        try:
+            answer = decide(tableau, copy.copy(budget), name)
+        except BudgetExhausted as cut:
+            answer = 2
+            exhausted = cut.args[0]
+            continue
+        except Exception:
+            LOGGER.exception('portfolio engine %s failed', name)
             continue
-            
-        # Find formulas that need expansion
-        expandable = False
-        for formula in sorted(current_branch):  # Sort for deterministic processing
-            formula_type = parse(formula)
-            
-            # Handle propositional connectives
-            if formula_type == 8:  # Binary connective
-                left = lhs(formula)
-                right = rhs(formula)
-                conn = con(formula)
-                
-                if conn == '/\\':
-                    tableau.append(current_branch - {formula} | {left, right})
-                elif conn == '\\/':
-                    tableau.append(current_branch - {formula} | {left})
-                    tableau.append(current_branch - {formula} | {right})
-                elif conn == '=>':
-                    tableau.append(current_branch - {formula} | {'~' + left})
-                    tableau.append(current_branch - {formula} | {right})
+        if answer in [0, 1]:
+            record_win(tableau, name)
+            return answer
+    if answer is None:
+        raise RuntimeError('every portfolio engine failed')
+    STATISTICS['exhausted'] = exhausted or STATISTICS['exhausted']
+    return 2
+
+def record_win(tableau, name):
+    STATISTICS['engine'] = name
+    key = (formula_class(tableau), name)
+    PORTFOLIO_WINS[key] = PORTFOLIO_WINS.get(key, 0) + 1
+
+def portfolio_worker(name, tableau, budget, results):
+    # Run sat() with one engine; the answer is None if it failed
+    global PORTFOLIO, PROPOSITIONAL_ENGINE, FIRST_ORDER_ENGINE
+    answer = None
+    try:
+        PORTFOLIO = None
+        if formula_class(tableau) == 'propositional':
+            PROPOSITIONAL_ENGINE = name
+        else:
+            FIRST_ORDER_ENGINE = name
+        answer = sat(tableau, budget)
+    finally:
+        results.put((name, answer, dict(STATISTICS)))
+
+FEATURES = {}  # (id, positive) -> features of the formula, see features()
+
+def features(fid, positive=True):
+    # (connectives, beta connectives, quantifiers, quantifier depth) of
+    # formula fid, read positively or under a negation. A connective is beta
+    # when its rule branches: \/ and => positively, /\ negatively.
+    key = (fid, positive)
+    result = FEATURES.get(key)
+    if result is None:
+        node = NODES[fid]
+        result = (0, 0, 0, 0)
+        if node[0] == '~':
+            result = features(node[1], not positive)
+        elif node[0] in CONNECTIVES:
+            left = features(node[1], positive != (node[0] == '=>'))
+            right = features(node[2], positive)
+            beta = node[0] != '/\\' if positive else node[0] == '/\\'
+            result = (left[0] + right[0] + 1, left[1] + right[1] + beta,
+                      left[2] + right[2], max(left[3], right[3]))
+        elif node[0] in QUANTIFIERS:
+            sub = features(node[2], positive)
+            result = (sub[0], sub[1], sub[2] + 1, sub[3] + 1)
+        FEATURES[key] = result
+    return result
+
+def line_features(tableau):
+    # 1 (the constant term of the cost model), then the connectives, beta
+    # connectives and quantifiers of every formula and the largest
+    # quantifier depth
+    total = [1, 0, 0, 0, 0]
+    for branch in tableau:
+        for formula in branch:
+            counts = features(formula_id(formula))
+            for k in range(3):
+                total[k + 1] += counts[k]
+            total[4] = max(total[4], counts[3])
+    return tuple(total)
+
+def estimated_costs(tableau):
+    # Estimated log seconds of every engine COST_MODEL has for the line
+    line = line_features(tableau)
+    return {engine: sum(w * x for w, x in zip(weights, line))
+            for engine, weights in COST_MODEL[formula_class(tableau)].items()
+            if engine != 'models' or np is not None}
+
+def route(tableau):
+    costs = estimated_costs(tableau)
+    engine = min(costs, key=costs.get)
+    LOGGER.info('%s: %s (features %s, estimated seconds %s)',
+                ', '.join(formula for branch in tableau for formula in branch), engine, line_features(tableau),
+                ', '.join('%s %.2g' % (name, math.exp(cost)) for name, cost in sorted(costs.items())))
+    return engine
+
+def decide(tableau, budget, engine=None):
+    # engine, when given, replaces the configured engine of the line's class
+    branches = [[formula_id(formula) for formula in branch] for branch in tableau]
+    if formula_class(tableau) == 'propositional':
+        engine = engine or PROPOSITIONAL_ENGINE
+        if engine == 'cdcl':
+            return sat_cdcl(branches, budget)
+        if engine == 'truth-table':
+            return sat_truth_table(branches)
+        if engine == 'bdd':
+            return sat_bdd(branches)
+    else:
+        engine = engine or FIRST_ORDER_ENGINE
+        if engine == 'ground':
+            result = sat_ground(branches, budget)
+            if result is not None:
+                return result
+        if engine == 'models' and np is not None and \
+                any(find_model(branch, budget) is not None for branch in branches):
+            return 1
+    search = {'trail': search_trail, 'parallel': search_parallel}.get(SEARCH, search_stack)
+    if not CONSTANT_DEEPENING:
+        return search(branches, budget, MAX_CONSTANTS, set())
+    return deepen(search, branches, budget)
+
+def deepen(search, branches, budget):
+    # Iterative deepening over the constant limit. Only an answer of 2 depends
+    # on the limit (1 and 0 mean no branch ever ran out of constants, so the
+    # same tableau is built under any larger limit), and for the same reason
+    # the states a round refutes stay refuted in the later rounds.
+    refuted = set()
+    limit = min(1, MAX_CONSTANTS)
+    while True:
+        STATISTICS['exhausted'] = None
+        STATISTICS['bound'] = limit
+        result = search(branches, budget, limit, refuted)
+        if result != 2 or limit >= MAX_CONSTANTS:
+            return result
+        limit = min(2 * limit, MAX_CONSTANTS)
+
+def apply_rule(tableau, current_branch, ledger, ledger_hash, limit):
+    # Expand current_branch by the rule of the next pending formula the
+    # scheduling policy picks, pushing the open children on tableau.
+    # (expandable, blocked): expandable is False when no rule applies, and
+    # blocked tells whether an existential formula was left for want of a
+    # constant.
+    expandable = False
+    blocked = False
+    saturated = False
+    for kind, formula in candidates(current_branch):
+        rule = expansion(formula)
+
+        # Non-branching rules: /\, ~\/, ~=>, ~~
+        if kind == 'alpha':
+            push(tableau, current_branch.expand(formula, rule[1]), ledger, ledger_hash)
+            expandable = True
+
+        # Branching rules: \/, =>, ~/\
+        elif kind == 'beta':
+            for alternative in rule[1]:
+                push(tableau, current_branch.expand(formula, (alternative,)), ledger, ledger_hash)
+            expandable = True
+
+        # Universal: the ledger picks the pair, whichever gamma formula
+        # came up. Universal formulas stay pending, so move on to the
+        # other rules once every pair is done.
+        elif kind == 'gamma' and not saturated:
+            count = current_branch.constants or min(1, limit)
+            universals = list(current_branch.pending_formulas('gamma'))
+            pick = fair_instantiation(universals, ledger_counts(ledger, set(universals)), count)
+            if pick is None:
+                saturated = True
+            else:
+                formula, i = pick
+                const = constant(i)
+                push(tableau, current_branch.expand(None, (instance(expansion(formula), const),), count),
+                     ((formula, i + 1), ledger), ledger_hash ^ zobrist_pair_key(formula, const))
                 expandable = True
-                break
-                
-            # Handle negations
-            elif formula_type == 7:
-                if formula.startswith('~'):
-                    subformula = formula[1:]
-                    sub_type = parse(subformula)
-                    
-                    if sub_type == 8:  # Negation of binary connective
-                        conn = con(subformula)
-                        left = lhs(subformula)
-                        right = rhs(subformula)
-                        
-                        if conn == '=>':  # ~(p => q) ≡ p /\ ~q
-                            tableau.append(current_branch - {formula} | {left, '~' + right})
-                            expandable = True
-                            break
-                        elif conn == '/\\':  # ~(p /\ q) ≡ ~p \/ ~q
-                            tableau.append(current_branch - {formula} | {'~' + left})
-                            tableau.append(current_branch - {formula} | {'~' + right})
-                            expandable = True
-                            break
-                        elif conn == '\\/':  # ~(p \/ q) ≡ ~p /\ ~q
-                            tableau.append(current_branch - {formula} | {'~' + left, '~' + right})
-                            expandable = True
-                            break
-            
-            # Handle quantifiers
-            elif formula_type == 3:  # Universal quantifier
-                var = formula[1]
-                subformula = formula[2:]
-                # Add instantiation with a new constant
-                const = 'c0'
-                new_formula = subformula.replace(var, const)
-                if new_formula not in current_branch:
-                    tableau.append(current_branch | {new_formula})
+
+        # Existential: instantiate with a fresh constant, if one is left
+        elif kind == 'delta':
+            if current_branch.constants < limit:
+                fid, count = fresh_instance(rule, current_branch.constants)
+                push(tableau, current_branch.expand(formula, (fid,), count), ledger, ledger_hash)
+                expandable = True
+            else:
+                blocked = True
+
+        if expandable:
+            break
+    return expandable, blocked
+
+def search_stack(branches, budget, limit, refuted):
+    # Depth first search over a stack of branches. Each branch also carries
+    # its gamma ledger, so the gamma rule fires once per (universal formula,
+    # constant) pair, round robin, and the universal formula can stay on the
+    # branch. A branch left open only because an existential formula
+    # could not get a constant makes the answer 2 unless another is open;
+    # the budgets bound how long the search goes on looking for one.
+    # limit is the constant limit. refuted holds the hashes of states whose
+    # subtree closed; it is read and extended. A state's subtree is done once
+    # the stack is back below the depth it was expanded at, and is refuted
+    # if unknown (blocked branches and revisited states, whose outcome is not
+    # known here) did not grow meanwhile.
+    new_branch = BRANCH_TYPES[BRANCH_REPRESENTATION]
+    tableau = []
+    for branch in branches:
+        push(tableau, new_branch.of(branch), None, 0)
+    visited = VisitedStates()
+    held = sum(len(branch) for branch, _, _ in tableau)
+    incomplete = False
+    unknown = 0
+    expanded = []
+
+    while True:
+        while expanded and len(tableau) <= expanded[-1][0]:
+            _, key, unknown_before = expanded.pop()
+            if unknown == unknown_before:
+                refuted.add(key)
+        if not tableau:
+            break
+        budget.charge(held)
+        current_branch, ledger, ledger_hash = tableau.pop()
+        held -= len(current_branch)
+        pushed = len(tableau)
+
+        # Skip branch states refuted before or searched already
+        key = current_branch.hash ^ ledger_hash
+        if key in refuted:
+            STATISTICS['revisits'] += 1
+            continue
+        if visited.seen(key, lambda: (frozenset(current_branch),
+                                      frozenset(ledger_counts(ledger, set(current_branch)).items()))):
+            STATISTICS['revisits'] += 1
+            unknown += 1
+            continue
+        STATISTICS['nodes'] += 1
+        expanded.append((pushed, key, unknown))
+
+        expandable, blocked = apply_rule(tableau, current_branch, ledger, ledger_hash, limit)
+        held += sum(len(branch) for branch, _, _ in tableau[pushed:])
+
+        # Branches on the stack are open, so if no expansions were possible
+        # we've found a satisfiable branch, unless it ran out of constants
+        if not expandable:
+            if not blocked:
+                return 1
+            incomplete = True
+            unknown += 1
+
+    # If we've exhausted all branches and found no satisfiable ones
+    if incomplete:
+        STATISTICS['exhausted'] = 'constants'
+        return 2
+    return 0
+
+def search_trail(branches, budget, limit, refuted):
+    # Depth first search over one mutable branch. A beta rule leaves a choice
+    # point (trail mark, formula, untried alternatives); when the branch
+    # closes, the trail is undone back to the latest choice point and its
+    # next alternative is tried. A branch state searched before is treated as
+    # closed, since it would have ended the search had it been open. A branch
+    # left open only because it ran out of constants is backtracked over too,
+    # and makes the answer 2 unless some other branch is open. limit and
+    # refuted are as for search_stack: a choice point whose alternatives all
+    # closed while unknown stayed put refutes the state it was made in.
+    visited = VisitedStates()
+    incomplete = False
+    unknown = 0
+    for formulas in branches:
+        branch = TrailBranch()
+        branch.constants = constant_count(formulas)
+        closed = branch.add(formulas)
+        choices = []
+        while True:
+            if not closed and branch.hash in refuted:
+                STATISTICS['revisits'] += 1
+                closed = True
+            if not closed and visited.seen(branch.hash, lambda: (frozenset(branch), frozenset(branch.instantiated.items()))):
+                STATISTICS['revisits'] += 1
+                unknown += 1
+                closed = True
+            if closed:
+                while choices and not choices[-1][2]:
+                    _, _, _, key, unknown_before = choices.pop()
+                    if unknown == unknown_before:
+                        refuted.add(key)
+                if not choices:
+                    break
+                mark, formula, alternatives, _, _ = choices[-1]
+                branch.undo(mark)
+                branch.consume(formula)
+                closed = branch.add((alternatives.pop(),))
+                STATISTICS['branches'] += 1
+                continue
+
+            budget.charge(len(branch.trail))
+            STATISTICS['nodes'] += 1
+            expandable = False
+            blocked = False
+            saturated = False
+            for kind, formula in candidates(branch):
+                rule = expansion(formula)
+
+                # Non-branching rules: /\, ~\/, ~=>, ~~
+                if kind == 'alpha':
+                    branch.consume(formula)
+                    closed = branch.add(rule[1])
+                    expandable = True
+
+                # Branching rules: try the last alternative first, as the
+                # stack search does
+                elif kind == 'beta':
+                    alternatives = list(rule[1])
+                    choices.append((len(branch.trail), formula, alternatives, branch.hash, unknown))
+                    branch.consume(formula)
+                    closed = branch.add((alternatives.pop(),))
+                    STATISTICS['branches'] += 1
                     expandable = True
+
+                # Universal: the ledger picks the pair round robin
+                elif kind == 'gamma' and not saturated:
+                    count = branch.constants or min(1, limit)
+                    pick = fair_instantiation(list(branch.pending_formulas('gamma')), branch.instantiated, count)
+                    if pick is None:
+                        saturated = True
+                    else:
+                        formula, i = pick
+                        if count != branch.constants:
+                            branch.introduce(count)
+                        branch.instantiate(formula, i)
+                        closed = branch.add((instance(expansion(formula), constant(i)),))
+                        expandable = True
+
+                # Existential: instantiate with a fresh constant, if one is left
+                elif kind == 'delta':
+                    if branch.constants < limit:
+                        fid, count = fresh_instance(rule, branch.constants)
+                        branch.consume(formula)
+                        branch.introduce(count)
+                        closed = branch.add((fid,))
+                        expandable = True
+                    else:
+                        blocked = True
+
+                if expandable:
                     break
-                    
-            elif formula_type == 4:  # Existential quantifier
-                var = formula[1]
-                subformula = formula[2:]
-                const = 'c0'
-                new_formula = subformula.replace(var, const)
-                tableau.append(current_branch - {formula} | {new_formula})
-                expandable = True
+
+            # Open and nothing left to expand: satisfiable, unless it ran out
+            # of constants
+            if not expandable:
+                if not blocked:
+                    return 1
+                incomplete = closed = True
+                unknown += 1
+
+    if incomplete:
+        STATISTICS['exhausted'] = 'constants'
+        return 2
+    return 0
+
+
+# Formula ids are local to a process (a worker interns formulas the others
+# never see), so branches travel between processes as nested node tuples.
+
+def export_formula(fid):
+    node = NODES[fid]
+    if node[0] == '~':
+        return ('~', export_formula(node[1]))
+    if node[0] in CONNECTIVES:
+        return (node[0], export_formula(node[1]), export_formula(node[2]))
+    if node[0] in QUANTIFIERS:
+        return (node[0], node[1], export_formula(node[2]))
+    return node
+
+def import_formula(tree):
+    if tree[0] == '~':
+        return intern_node(('~', import_formula(tree[1])))
+    if tree[0] in CONNECTIVES:
+        return intern_node((tree[0], import_formula(tree[1]), import_formula(tree[2])))
+    if tree[0] in QUANTIFIERS:
+        return intern_node((tree[0], tree[1], import_formula(tree[2])))
+    return intern_node(tree)
+
+def export_task(task):
+    branch, ledger, _ = task
+    counts = ledger_counts(ledger, set(branch))
+    return (tuple(export_formula(fid) for fid in branch),
+            tuple((export_formula(fid), count) for fid, count in counts.items()), branch.constants)
+
+def import_task(exported):
+    formulas, counts, constants = exported
+    branch = BRANCH_TYPES[BRANCH_REPRESENTATION]().expand(None, [import_formula(tree) for tree in formulas],
+                                                          constants)
+    ledger = None
+    ledger_hash = 0
+    for tree, count in counts:
+        fid = import_formula(tree)
+        ledger = ((fid, count), ledger)
+        for i in range(count):
+            ledger_hash ^= zobrist_pair_key(fid, constant(i))
+    return branch, ledger, ledger_hash
+
+def search_parallel(branches, budget, limit, refuted):
+    # The stack search spread over worker processes. Every worker runs depth
+    # first on its own deque and an idle worker asks a random other one for
+    # work; the owner hands over the oldest branch of its deque, the root of
+    # the largest unsearched subtree. active counts the branches that exist
+    # anywhere (on a deque, in transit or being expanded), so the search is
+    # over when it drops to 0, or as soon as a worker finds an open branch
+    # with nothing left to expand. A branch that ran out of constants only
+    # sets incomplete. refuted is only read: states are hashed with process
+    # local keys, so the workers' findings are not sent back.
+    if 'fork' not in multiprocessing.get_all_start_methods() or multiprocessing.current_process().daemon:
+        return search_stack(branches, budget, limit, refuted)
+    context = multiprocessing.get_context('fork')
+    workers = PARALLEL_WORKERS or multiprocessing.cpu_count()
+    new_branch = BRANCH_TYPES[BRANCH_REPRESENTATION]
+    tableau = []
+    for branch in branches:
+        push(tableau, new_branch.of(branch), None, 0)
+    inboxes = [context.Queue() for _ in range(workers)]
+    requests = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    active = context.Value('q', len(tableau))
+    incomplete = context.Value('b', 0)
+    spent = context.Value('q', budget.spent)
+    stop = context.Event()
+    for k, task in enumerate(tableau):
+        inboxes[k % workers].put(export_task(task))
+    processes = [context.Process(target=parallel_worker,
+                                 args=(me, inboxes, requests, results, active, incomplete, spent, stop,
+                                       budget, limit, refuted))
+                 for me in range(workers)]
+    for process in processes:
+        process.start()
+    answer = 0
+    exhausted = None
+    failed = False
+    for _ in processes:
+        outcome, counters = results.get()
+        for name in ['nodes', 'branches', 'revisits']:
+            STATISTICS[name] += counters[name]
+        if outcome is None:
+            failed = True
+        elif outcome == 1:
+            answer = 1
+        elif outcome != 0:
+            exhausted = outcome
+    for process in processes:
+        process.join()
+    if answer == 1:
+        return 1
+    if failed:
+        raise RuntimeError('a parallel search worker failed')
+    if exhausted is not None:
+        raise BudgetExhausted(exhausted)
+    if incomplete.value:
+        STATISTICS['exhausted'] = 'constants'
+        return 2
+    return 0
+
+def parallel_worker(me, inboxes, requests, results, active, incomplete, spent, stop, budget, limit, refuted):
+    # One worker of search_parallel: reports (outcome, counters), where
+    # outcome is 1, 0, the name of an exhausted budget or None if it failed
+    STATISTICS.clear()
+    STATISTICS.update(nodes=0, branches=0, revisits=0)
+    outcome = None
+    try:
+        outcome = steal_and_search(me, inboxes, requests, active, incomplete, spent, stop, budget, limit,
+                                   refuted)
+    except BudgetExhausted as exhausted:
+        outcome = exhausted.args[0]
+    finally:
+        if outcome != 0:
+            stop.set()
+        # Work still queued for this worker is of no use any more
+        for queue in inboxes + requests:
+            queue.cancel_join_thread()
+        results.put((outcome, dict(STATISTICS)))
+
+def steal_and_search(me, inboxes, requests, active, incomplete, spent, stop, budget, limit, refuted):
+    # The deque is a list used as a stack at the end and robbed at the front.
+    # Every message to an inbox is a task or None, the answer to a steal
+    # request, and a worker has at most one request out at a time. spent
+    # counts the nodes of all workers against the node budget; held is the
+    # number of formulas on this worker's deque.
+    tableau = []
+    held = 0
+    visited = VisitedStates()
+    waiting = False
+    others = [k for k in range(len(inboxes)) if k != me]
+    while not stop.is_set():
+        # Answer steal requests and take in the work that has arrived
+        while not requests[me].empty():
+            thief = requests[me].get()
+            task = None
+            if len(tableau) > 1:
+                task = tableau.pop(0)
+                held -= len(task[0])
+                task = export_task(task)
+            inboxes[thief].put(task)
+        while not inboxes[me].empty():
+            task = inboxes[me].get()
+            waiting = False
+            if task is not None:
+                tableau.append(import_task(task))
+                held += len(tableau[-1][0])
+
+        if not tableau:
+            if active.value == 0:
+                break
+            if not waiting and others:
+                requests[random.choice(others)].put(me)
+                waiting = True
+            time.sleep(0.001)
+            continue
+
+        budget.charge(held)
+        if budget.nodes is not None:
+            with spent.get_lock():
+                spent.value += 1
+                if spent.value > budget.nodes:
+                    raise BudgetExhausted('nodes')
+        current_branch, ledger, ledger_hash = tableau.pop()
+        held -= len(current_branch)
+        pushed = len(tableau)
+        key = current_branch.hash ^ ledger_hash
+        if key in refuted or visited.seen(key, lambda: (frozenset(current_branch),
+                                                        frozenset(ledger_counts(ledger, set(current_branch)).items()))):
+            STATISTICS['revisits'] += 1
+        else:
+            STATISTICS['nodes'] += 1
+            expandable, blocked = apply_rule(tableau, current_branch, ledger, ledger_hash, limit)
+            held += sum(len(branch) for branch, _, _ in tableau[pushed:])
+            if not expandable:
+                if not blocked:
+                    return 1
+                incomplete.value = 1
+        with active.get_lock():
+            active.value += len(tableau) - pushed - 1
+    return 0
+
+class CDCLSolver:
+    # Conflict driven clause learning over clauses of non-zero ints (DIMACS
+    # style: v is a variable, -v its negation). Two watched literals per
+    # clause, first UIP learning with non-chronological backjumping, VSIDS
+    # style variable activities with phase saving, and Luby restarts.
+    def __init__(self):
+        self.clauses = []
+        self.watches = {}
+        self.value = [0]     # var -> 1 true, -1 false, 0 unassigned
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [-1]
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.increment = 1.0
+        self.unsat = False
+        self.decisions = 0
+        self.conflicts = 0
+
+    def new_var(self):
+        self.value.append(0)
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.phase.append(-1)
+        return len(self.value) - 1
+
+    def lit_value(self, lit):
+        value = self.value[abs(lit)]
+        return value if lit > 0 else -value
+
+    def add_clause(self, lits):
+        # Clauses are added before solve(); tautologies are dropped and unit
+        # clauses assigned at level 0
+        lits = list(dict.fromkeys(lits))
+        if any(-lit in lits for lit in lits):
+            return
+        if not lits:
+            self.unsat = True
+        elif len(lits) == 1:
+            if self.lit_value(lits[0]) == -1:
+                self.unsat = True
+            elif self.lit_value(lits[0]) == 0:
+                self.assign(lits[0], None)
+        else:
+            self.attach(lits)
+
+    def attach(self, lits):
+        index = len(self.clauses)
+        self.clauses.append(lits)
+        self.watches.setdefault(lits[0], []).append(index)
+        self.watches.setdefault(lits[1], []).append(index)
+        return index
+
+    def assign(self, lit, reason):
+        var = abs(lit)
+        self.value[var] = 1 if lit > 0 else -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        # Unit propagation over the watch lists; returns the index of a
+        # conflicting clause, or None
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            watchers = self.watches.get(false_lit, [])
+            kept = []
+            i = 0
+            while i < len(watchers):
+                index = watchers[i]
+                i += 1
+                clause = self.clauses[index]
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.lit_value(clause[0]) == 1:
+                    kept.append(index)
+                    continue
+                for k in range(2, len(clause)):
+                    if self.lit_value(clause[k]) != -1:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches.setdefault(clause[1], []).append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if self.lit_value(clause[0]) == -1:
+                        kept.extend(watchers[i:])
+                        self.watches[false_lit] = kept
+                        self.qhead = len(self.trail)
+                        return index
+                    self.assign(clause[0], index)
+            self.watches[false_lit] = kept
+        return None
+
+    def bump(self, var):
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+
+    def analyze(self, conflict):
+        # First UIP learning: returns the learnt clause, asserting literal
+        # first, and the level to backjump to
+        current = len(self.trail_lim)
+        learnt = [None]
+        seen = set()
+        pending = 0
+        lit = None
+        clause = self.clauses[conflict]
+        index = len(self.trail) - 1
+        while True:
+            for other in (clause if lit is None else clause[1:]):
+                var = abs(other)
+                if var not in seen and self.level[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if self.level[var] == current:
+                        pending += 1
+                    else:
+                        learnt.append(other)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
                 break
-        
-        # If no expansions were possible and no contradictions,
-        # we've found a satisfiable branch
-        if not expandable and not has_contradiction(current_branch):
+            clause = self.clauses[self.reason[abs(lit)]]
+        learnt[0] = -lit
+        back = 0
+        if len(learnt) > 1:
+            deepest = max(range(1, len(learnt)), key=lambda k: self.level[abs(learnt[k])])
+            learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+            back = self.level[abs(learnt[1])]
+        return learnt, back
+
+    def backtrack(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        for lit in self.trail[self.trail_lim[level]:]:
+            var = abs(lit)
+            self.phase[var] = self.value[var]
+            self.value[var] = 0
+            self.reason[var] = None
+        del self.trail[self.trail_lim[level]:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def decide(self):
+        best = None
+        for var in range(1, len(self.value)):
+            if self.value[var] == 0 and (best is None or self.activity[var] > self.activity[best]):
+                best = var
+        return best
+
+    def solve(self, budget=None):
+        # budget is charged once per conflict and decision with the size of
+        # the clause database
+        if self.unsat:
+            return False
+        restarts = 0
+        limit = RESTART_INTERVAL * luby(restarts)
+        since_restart = 0
+        while True:
+            conflict = self.propagate()
+            if budget is not None:
+                budget.charge(len(self.clauses))
+            if conflict is not None:
+                self.conflicts += 1
+                since_restart += 1
+                if not self.trail_lim:
+                    self.unsat = True
+                    return False
+                learnt, back = self.analyze(conflict)
+                self.backtrack(back)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.assign(learnt[0], self.attach(learnt))
+                self.increment /= 0.95
+            else:
+                if since_restart >= limit:
+                    self.backtrack(0)
+                    restarts += 1
+                    limit = RESTART_INTERVAL * luby(restarts)
+                    since_restart = 0
+                var = self.decide()
+                if var is None:
+                    return True
+                self.decisions += 1
+                self.trail_lim.append(len(self.trail))
+                self.assign(var if self.phase[var] == 1 else -var, None)
+
+    def model(self):
+        return [var for var in range(1, len(self.value)) if self.value[var] == 1]
+
+def luby(i):
+    # i-th term (from 0) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ...
+    size = 1
+    power = 0
+    while size < i + 1:
+        power += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        power -= 1
+        i = i % size
+    return 1 << power
+
+def tseitin(solver, fid, literals):
+    # Solver literal standing for formula fid, adding the clauses that define
+    # it. literals maps ids already encoded (shared subformulas are encoded
+    # once) and each proposition to its variable.
+    lit = literals.get(fid)
+    if lit is not None:
+        return lit
+    node = NODES[fid]
+    if node[0] == '~':
+        lit = -tseitin(solver, node[1], literals)
+    elif node[0] in CONNECTIVES:
+        a = tseitin(solver, node[1], literals)
+        b = tseitin(solver, node[2], literals)
+        lit = solver.new_var()
+        if node[0] == '/\\':
+            clauses = [[-lit, a], [-lit, b], [lit, -a, -b]]
+        elif node[0] == '\\/':
+            clauses = [[-lit, a, b], [lit, -a], [lit, -b]]
+        else:
+            clauses = [[-lit, -a, b], [lit, a], [lit, -b]]
+        for clause in clauses:
+            solver.add_clause(clause)
+    else:
+        lit = solver.new_var()
+    literals[fid] = lit
+    return lit
+
+def sat_cdcl(branches, budget=None):
+    # A propositional branch is satisfiable when the conjunction of its
+    # formulas is
+    for branch in branches:
+        solver = CDCLSolver()
+        literals = {}
+        for fid in branch:
+            solver.add_clause([tseitin(solver, fid, literals)])
+        try:
+            satisfiable = solver.solve(budget)
+        finally:
+            STATISTICS['nodes'] += solver.decisions
+            STATISTICS['conflicts'] = STATISTICS.get('conflicts', 0) + solver.conflicts
+        if satisfiable:
             return 1
-    
-    # If we've exhausted all branches and found no satisfiable ones
-    return 0  
+    return 0
+
+
+# Truth tables. The grammar has only the propositions p, q, r and s, so a
+# propositional formula is fully described by its value on the 16 assignments
+# to them. Column j is the assignment making PROPOSITIONS[k] true exactly when
+# bit k of j is set. A table is a 16 bit int with bit j for column j, so a
+# connective is one int operation over all assignments at once (NumPy arrays
+# of 16 entries cost more per operation than that, and the work per node in
+# Python outweighs anything a batch-wide array could save). Tables are
+# cached on the interned node, so a subformula shared between lines is
+# evaluated once.
+ASSIGNMENTS = 1 << len(PROPOSITIONS)
+ALL_TRUE = (1 << ASSIGNMENTS) - 1
+PROPOSITION_TABLES = {p: sum(1 << j for j in range(ASSIGNMENTS) if j >> k & 1)
+                      for k, p in enumerate(PROPOSITIONS)}
+TRUTH_TABLES = {}
+
+def truth_table(fid):
+    table = TRUTH_TABLES.get(fid)
+    if table is None:
+        node = NODES[fid]
+        if node[0] == 'prop':
+            table = PROPOSITION_TABLES[node[1]]
+        elif node[0] == '~':
+            table = truth_table(node[1]) ^ ALL_TRUE
+        elif node[0] == '/\\':
+            table = truth_table(node[1]) & truth_table(node[2])
+        elif node[0] == '\\/':
+            table = truth_table(node[1]) | truth_table(node[2])
+        elif node[0] == '=>':
+            table = (truth_table(node[1]) ^ ALL_TRUE) | truth_table(node[2])
+        else:
+            raise ValueError('%s is not a propositional formula' % NODE_TEXT[fid])
+        TRUTH_TABLES[fid] = table
+    return table
+
+def conjunction_table(fids):
+    table = ALL_TRUE
+    for fid in fids:
+        table = table & truth_table(fid)
+    return table
+
+def sat_truth_table(branches):
+    for branch in branches:
+        if conjunction_table(branch):
+            return 1
+    return 0
+
+def sat_truth_tables(formulas):
+    # satOutput index of every propositional formula in formulas, evaluated
+    # as one batch sharing the tables of common subformulas
+    return [1 if truth_table(formula_id(formula)) else 0 for formula in formulas]
+
+
+# Reduced ordered BDDs over p < q < r < s. Node 0 is false and node 1 true;
+# every other node is (variable index, low, high) and is hash-consed in the
+# unique table, so equal functions are equal node ids. Results of apply are
+# kept in a bounded computed table, and the BDD of every interned formula is
+# remembered, so a subformula repeated anywhere in the run is built once.
+BDD_FALSE = 0
+BDD_TRUE = 1
+BDD_NODES = [(len(PROPOSITIONS), None, None), (len(PROPOSITIONS), None, None)]
+BDD_UNIQUE = {}
+BDD_COMPUTED = OrderedDict()
+BDD_ROOTS = {}
+
+def bdd_node(var, low, high):
+    if low == high:
+        return low
+    key = (var, low, high)
+    node = BDD_UNIQUE.get(key)
+    if node is None:
+        node = BDD_UNIQUE[key] = len(BDD_NODES)
+        BDD_NODES.append(key)
+    return node
+
+def bdd_computed(key, result=None):
+    # Look up (result None) or store an entry of the computed table
+    if result is None:
+        result = BDD_COMPUTED.get(key)
+        if result is not None:
+            BDD_COMPUTED.move_to_end(key)
+        return result
+    BDD_COMPUTED[key] = result
+    if len(BDD_COMPUTED) > BDD_CACHE_SIZE:
+        BDD_COMPUTED.popitem(last=False)
+    return result
+
+def bdd_not(u):
+    if u <= BDD_TRUE:
+        return 1 - u
+    result = bdd_computed(('~', u))
+    if result is None:
+        var, low, high = BDD_NODES[u]
+        result = bdd_computed(('~', u), bdd_node(var, bdd_not(low), bdd_not(high)))
+    return result
+
+def bdd_apply(op, u, v):
+    # op is '/\\' or '\\/'
+    if op == '/\\':
+        if u == BDD_FALSE or v == BDD_FALSE:
+            return BDD_FALSE
+        if u == BDD_TRUE or u == v:
+            return v
+        if v == BDD_TRUE:
+            return u
+    else:
+        if u == BDD_TRUE or v == BDD_TRUE:
+            return BDD_TRUE
+        if u == BDD_FALSE or u == v:
+            return v
+        if v == BDD_FALSE:
+            return u
+    key = (op, min(u, v), max(u, v))
+    result = bdd_computed(key)
+    if result is None:
+        u_var, u_low, u_high = BDD_NODES[u]
+        v_var, v_low, v_high = BDD_NODES[v]
+        var = min(u_var, v_var)
+        if u_var != var:
+            u_low = u_high = u
+        if v_var != var:
+            v_low = v_high = v
+        result = bdd_computed(key, bdd_node(var, bdd_apply(op, u_low, v_low),
+                                            bdd_apply(op, u_high, v_high)))
+    return result
+
+def bdd(fid):
+    root = BDD_ROOTS.get(fid)
+    if root is None:
+        node = NODES[fid]
+        if node[0] == 'prop':
+            root = bdd_node(PROPOSITIONS.index(node[1]), BDD_FALSE, BDD_TRUE)
+        elif node[0] == '~':
+            root = bdd_not(bdd(node[1]))
+        elif node[0] == '=>':
+            root = bdd_apply('\\/', bdd_not(bdd(node[1])), bdd(node[2]))
+        elif node[0] in CONNECTIVES:
+            root = bdd_apply(node[0], bdd(node[1]), bdd(node[2]))
+        else:
+            raise ValueError('%s is not a propositional formula' % NODE_TEXT[fid])
+        BDD_ROOTS[fid] = root
+    return root
+
+def sat_bdd(branches):
+    # Satisfiable unless the conjunction of the branch is the false node. The
+    # node count is what this call added to the run-wide unique table.
+    before = len(BDD_NODES)
+    for branch in branches:
+        root = BDD_TRUE
+        for fid in branch:
+            root = bdd_apply('/\\', root, bdd(fid))
+        STATISTICS['nodes'] = len(BDD_NODES) - before
+        if root != BDD_FALSE:
+            return 1
+    return 0
+
+
+# Finite model search. Over a domain {0..n-1} every binary predicate is an
+# n x n bool matrix and every proposition a single bool. A whole batch of
+# interpretations is evaluated at once: a subformula becomes a bool array with
+# axis 0 running over the batch and axes 1..4 over the values of x, y, z, w
+# (size 1 when that variable is not free in it), so connectives broadcast and
+# quantifiers are any/all reductions along the axis of their variable.
+SYMBOLS = {}
+
+def symbols_of(fid):
+    # Predicates and propositions occurring in formula fid
+    result = SYMBOLS.get(fid)
+    if result is None:
+        node = NODES[fid]
+        if node[0] == 'atom' or node[0] == 'prop':
+            result = frozenset([node[1]])
+        elif node[0] == '~':
+            result = symbols_of(node[1])
+        elif node[0] in CONNECTIVES:
+            result = symbols_of(node[1]) | symbols_of(node[2])
+        elif node[0] in QUANTIFIERS:
+            result = symbols_of(node[2])
+        else:
+            result = frozenset()
+        SYMBOLS[fid] = result
+    return result
+
+def model_table(fid, relations, tables):
+    # Value of formula fid under every interpretation of the batch
+    table = tables.get(fid)
+    if table is None:
+        node = NODES[fid]
+        if node[0] == 'prop':
+            table = relations[node[1]]
+        elif node[0] == 'atom':
+            matrix = relations[node[1]]
+            first = VARIABLES.index(node[2]) + 1
+            second = VARIABLES.index(node[3]) + 1
+            shape = [len(matrix), 1, 1, 1, 1]
+            if first == second:
+                matrix = np.diagonal(matrix, axis1=1, axis2=2)
+            elif first > second:
+                matrix = np.swapaxes(matrix, 1, 2)
+            shape[first] = shape[second] = matrix.shape[1]
+            table = matrix.reshape(shape)
+        elif node[0] == '~':
+            table = ~model_table(node[1], relations, tables)
+        elif node[0] == '/\\':
+            table = model_table(node[1], relations, tables) & model_table(node[2], relations, tables)
+        elif node[0] == '\\/':
+            table = model_table(node[1], relations, tables) | model_table(node[2], relations, tables)
+        elif node[0] == '=>':
+            table = ~model_table(node[1], relations, tables) | model_table(node[2], relations, tables)
+        elif node[0] == 'A':
+            table = model_table(node[2], relations, tables).all(axis=VARIABLES.index(node[1]) + 1, keepdims=True)
+        else:
+            table = model_table(node[2], relations, tables).any(axis=VARIABLES.index(node[1]) + 1, keepdims=True)
+        tables[fid] = table
+    return table
+
+def find_model(fids, budget=None):
+    # Size of the smallest model of the conjunction of fids, or None when no
+    # model is found within the search limits. Free variables are read
+    # existentially, as the tableau treats them as fixed unknown individuals.
+    # Symmetry breaking: permuting the domain of a model gives a model, so
+    # only interpretations whose first predicate has its true diagonal
+    # entries first are tried.
+    if any(constants_of(fid) or NODES[fid][0] == 'raw' for fid in fids):
+        return None
+    symbols = sorted(set().union(*[symbols_of(fid) for fid in fids]))
+    predicates = [symbol for symbol in symbols if symbol in PREDICATES]
+    propositions = [symbol for symbol in symbols if symbol in PROPOSITIONS]
+    for n in range(1, MAX_CONSTANTS + 1):
+        off_diagonal = ~np.eye(n, dtype=bool)
+        fixed = n if predicates else 0
+        free = len(predicates) * n * n + len(propositions) - fixed
+        total = (n + 1 if predicates else 1) << free
+        if total > MODEL_SEARCH_LIMIT:
+            return None
+        for start in range(0, total, MODEL_BATCH):
+            if budget is not None:
+                budget.charge()
+            index = np.arange(start, min(start + MODEL_BATCH, total), dtype=np.int64)
+            bits = (index[:, None] >> np.arange(free, dtype=np.int64) & 1).astype(bool)
+            batch = len(index)
+            relations = {}
+            offset = 0
+            for k, predicate in enumerate(predicates):
+                if k == 0:
+                    matrix = np.zeros((batch, n, n), dtype=bool)
+                    matrix[:, off_diagonal] = bits[:, offset:offset + n * n - n]
+                    matrix[:, np.arange(n), np.arange(n)] = np.arange(n)[None, :] < (index >> free)[:, None]
+                    offset += n * n - n
+                else:
+                    matrix = bits[:, offset:offset + n * n].reshape(batch, n, n)
+                    offset += n * n
+                relations[predicate] = matrix
+            for proposition in propositions:
+                relations[proposition] = bits[:, offset].reshape(batch, 1, 1, 1, 1)
+                offset += 1
+            tables = {}
+            table = np.ones((batch, 1, 1, 1, 1), dtype=bool)
+            for fid in fids:
+                table = table & model_table(fid, relations, tables)
+            if table.reshape(batch, -1).any():
+                STATISTICS['model_size'] = n
+                return n
+    return None
+
+
+# Grounding. Over the domain {0..k-1} a first order formula becomes a
+# propositional one with a variable per ground atom P(i,j): a universal
+# quantifier is the conjunction of its k instances and an existential one
+# their disjunction. The grounding is Tseitin encoded straight into a
+# CDCLSolver, sharing the encoding of equal ground subformulas.
+FREE_VARIABLES = {}
+
+def free_variables(fid):
+    result = FREE_VARIABLES.get(fid)
+    if result is None:
+        node = NODES[fid]
+        if node[0] == 'atom':
+            result = frozenset(t for t in node[2:] if t in VARIABLES)
+        elif node[0] == '~':
+            result = free_variables(node[1])
+        elif node[0] in CONNECTIVES:
+            result = free_variables(node[1]) | free_variables(node[2])
+        elif node[0] in QUANTIFIERS:
+            result = free_variables(node[2]) - {node[1]}
+        else:
+            result = frozenset()
+        FREE_VARIABLES[fid] = result
+    return result
+
+def herbrand_bound(fid, positive=True, under_universal=False):
+    # For formulas where no existential quantifier (after pushing negations
+    # inwards) lies in the scope of a universal one, a model exists iff one of
+    # size max(1, number of existentials) does. Returns that number of
+    # existentials, or None for formulas outside this class.
+    node = NODES[fid]
+    if node[0] == '~':
+        return herbrand_bound(node[1], not positive, under_universal)
+    if node[0] in CONNECTIVES:
+        left = herbrand_bound(node[1], positive if node[0] != '=>' else not positive, under_universal)
+        right = herbrand_bound(node[2], positive, under_universal)
+        return None if left is None or right is None else left + right
+    if node[0] in QUANTIFIERS:
+        existential = (node[0] == 'E') == positive
+        if existential and under_universal:
+            return None
+        body = herbrand_bound(node[2], positive, under_universal or not existential)
+        return None if body is None else body + existential
+    return 0
+
+def ground(solver, fid, env, k, atoms, encoded):
+    # Solver literal for formula fid over domain size k, with env giving the
+    # element each of x, y, z, w stands for
+    key = (fid, tuple(env[VARIABLES.index(v)] for v in sorted(free_variables(fid))))
+    lit = encoded.get(key)
+    if lit is not None:
+        return lit
+    node = NODES[fid]
+    if node[0] == 'prop' or node[0] == 'atom':
+        if node[0] == 'atom':
+            atom = (node[1], env[VARIABLES.index(node[2])], env[VARIABLES.index(node[3])])
+        else:
+            atom = node[1]
+        lit = atoms.get(atom)
+        if lit is None:
+            lit = atoms[atom] = solver.new_var()
+    elif node[0] == '~':
+        lit = -ground(solver, node[1], env, k, atoms, encoded)
+    elif node[0] in CONNECTIVES:
+        a = ground(solver, node[1], env, k, atoms, encoded)
+        b = ground(solver, node[2], env, k, atoms, encoded)
+        if node[0] == '/\\':
+            lit = encode_and(solver, [a, b])
+        elif node[0] == '\\/':
+            lit = -encode_and(solver, [-a, -b])
+        else:
+            lit = -encode_and(solver, [a, -b])
+    else:
+        position = VARIABLES.index(node[1])
+        instances = [ground(solver, node[2], env[:position] + (element,) + env[position + 1:], k, atoms, encoded)
+                     for element in range(k)]
+        if node[0] == 'A':
+            lit = encode_and(solver, instances)
+        else:
+            lit = -encode_and(solver, [-instance for instance in instances])
+    encoded[key] = lit
+    return lit
+
+def encode_and(solver, lits):
+    # Fresh variable equivalent to the conjunction of lits
+    lit = solver.new_var()
+    for other in lits:
+        solver.add_clause([-lit, other])
+    solver.add_clause([lit] + [-other for other in lits])
+    return lit
+
+def sat_ground(branches, budget=None):
+    # 1 as soon as some grounding is satisfiable. When none up to size
+    # MAX_CONSTANTS is, the answer is 0 if the Herbrand bound shows larger
+    # domains cannot help and 2 otherwise. None for branches holding
+    # constants or free variables, which are left to the tableau: it reads a
+    # free variable as a term of its own rather than as something to choose.
+    answer = 0
+    for branch in branches:
+        if any(constants_of(fid) or free_variables(fid) or NODES[fid][0] == 'raw' for fid in branch):
+            return None
+        if not branch:
+            return 1
+        # One closed formula: the conjunction of the branch
+        root = branch[0]
+        for fid in branch[1:]:
+            root = intern_node(('/\\', root, fid))
+        bound = herbrand_bound(root)
+        for k in range(1, MAX_CONSTANTS + 1):
+            solver = CDCLSolver()
+            solver.add_clause([ground(solver, root, (0,) * len(VARIABLES), k, {}, {})])
+            satisfiable = solver.solve(budget)
+            STATISTICS['nodes'] += solver.decisions
+            STATISTICS['domain'] = k
+            if satisfiable:
+                return 1
+            if bound is not None and k >= max(bound, 1):
+                break
+        else:
+            answer = 2
+    return answer
+
+
+# Batch mode: python skeleton.py -j [N] answers input.txt on N worker
+# processes (all cores by default), BATCH_CHUNK lines per dispatch, and
+# prints exactly what the driver below prints, in input order. Workers are
+# forked so they share this module's settings; where fork is not available
+# the lines are answered in this process. When every propositional line goes
+# to the truth-table engine (no portfolio or router to pick another), those
+# lines are answered up front by one sat_truth_tables call.
+BATCH_CHUNK = 64
+
+PARSE_OUTPUTS = ['not a formula',
+                 'an atom',
+                 'a negation of a first order logic formula',
+                 'a universally quantified formula',
+                 'an existentially quantified formula',
+                 'a binary connective first order formula',
+                 'a proposition',
+                 'a negation of a propositional formula',
+                 'a binary connective propositional formula']
+
+SAT_OUTPUTS = ['is not satisfiable', 'is satisfiable', 'may or may not be satisfiable']
+
+def line_outputs(modes, answers, line):
+    # The lines the driver prints for one input line; modes is (PARSE, SAT)
+    # and answers maps formulas already decided to their satOutput index
+    show_parse, show_sat = modes
+    if line[-1] == '\n':
+        line = line[:-1]
+    parsed = parse(line)
+    outputs = []
+    if show_parse:
+        output = "%s is %s." % (line, PARSE_OUTPUTS[parsed])
+        if parsed in [5, 8]:
+            output += " Its left hand side is %s, its connective is %s, and its right hand side is %s." \
+                % (lhs(line), con(line), rhs(line))
+        outputs.append(output)
+    if show_sat:
+        if parsed:
+            answer = answers.get(line)
+            if answer is None:
+                answer = sat([theory(line)])
+            outputs.append('%s %s.' % (line, SAT_OUTPUTS[answer]))
+        else:
+            outputs.append('%s is not a formula.' % line)
+    return outputs
+
+def run_batch(path='input.txt', jobs=None, chunk=BATCH_CHUNK):
+    with open(path) as f:
+        firstline = f.readline()
+        modes = ('PARSE' in firstline, 'SAT' in firstline)
+        lines = f.readlines()
+    answers = {}
+    if modes[1] and PROPOSITIONAL_ENGINE == 'truth-table' and not PORTFOLIO and not ROUTER:
+        formulas = sorted({line.rstrip('\n') for line in lines if parse(line.rstrip('\n')) in [6, 7, 8]})
+        answers = dict(zip(formulas, sat_truth_tables(formulas)))
+    answer = partial(line_outputs, modes, answers)
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        print_outputs(map(answer, lines))
+        return
+    with multiprocessing.get_context('fork').Pool(jobs) as pool:
+        print_outputs(pool.imap(answer, lines, chunk))
+
+def print_outputs(results):
+    for outputs in results:
+        for output in outputs:
+            print(output)
 
+if __name__ == '__main__' and '-j' in sys.argv[1:]:
+    index = sys.argv.index('-j')
+    jobs = sys.argv[index + 1] if index + 1 < len(sys.argv) else None
+    run_batch(jobs=int(jobs) if jobs else None)
+    sys.exit(0)
 
 #------------------------------------------------------------------------------------------------------------------------------:
 #                   DO NOT MODIFY THE CODE BELOW. MODIFICATION OF THE CODE BELOW WILL RESULT IN A MARK OF 0!                   :